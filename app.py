@@ -1,9 +1,121 @@
 # Interactive financial dashboard using Streamlit
+import os
+import uuid
+
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
 
+from cache import ResultCache, cached_simulation, content_key, load_or_build_lattice
+from figures import MAX_POINTS, balances_figure, cashflow_figure, interest_figure, probability_figure
+from engine import DEFAULT_SCHEDULE, EVENT_KINDS, HORIZON_END, IncrementalSimulation, check_event, compile_schedule
+from montecarlo import run_monte_carlo
+from optimizer import optimize_allocation
+from profiling import Profiler, stage
+from scenarios import ScenarioStore, compare_scenarios
+from service import ComputeService
+from sensitivity import METRIC_LABELS, SENSITIVITY_LABELS, interaction_grid, tornado
+from solver import VARIABLE_BOUNDS, VARIABLE_LABELS, feasibility_frontier, solve_threshold
+from transactions import expense_vector, import_transactions
+
+# Discrete sidebar inputs, shared by the widgets and the precomputed lattice
+FX_OPTIONS = [round(1.2 + 0.01 * i, 2) for i in range(31)]
+JESS_START_OPTIONS = ["2025-07", "2025-08", "2025-09", "2025-10", "2025-11", "2025-12", "2026-01"]
+COMP_CASES = {"Base Case": 0, "Best Case": 150000}
+COTTAGE_PRICE_OPTIONS = list(range(350000, 450001, 10000))
+# Simulation end months, from the household plan out to 40 years
+HORIZON_OPTIONS = {
+    f"To {HORIZON_END}": HORIZON_END,
+    "10 Years": "2034-05",
+    "20 Years": "2044-05",
+    "30 Years": "2054-05",
+    "40 Years": "2064-05",
+}
+ACCRUAL_OPTIONS = {"Monthly (rate ÷ 12)": "monthly", "Daily (actual/365)": "daily"}
+
+
+@st.cache_resource
+def get_result_cache():
+    # One cache per server process, shared by every session; its byte budget
+    # covers simulation results, heavy job results and input lattices
+    return ResultCache(max_bytes=int(os.environ.get("FORWARD_FLOW_CACHE_MB", "256")) * 2**20)
+
+
+@st.cache_resource
+def get_compute_service():
+    # Heavy jobs from every session share this bounded worker pool
+    return ComputeService(
+        get_result_cache(),
+        workers=int(os.environ.get("FORWARD_FLOW_WORKERS", "2")),
+        max_queued=int(os.environ.get("FORWARD_FLOW_MAX_QUEUED", "32")),
+    )
+
+
+@st.cache_resource
+def get_scenario_store():
+    return ScenarioStore()
+
+
+def get_lattice(jack_income_usd, jessica_income_cad, start_savings):
+    # Lattices live in the result cache so they count against its budget;
+    # an evicted one is reloaded from disk
+    fixed = dict(
+        jack_income_usd=jack_income_usd,
+        jessica_income_cad=jessica_income_cad,
+        start_savings=start_savings,
+    )
+    axes = {
+        "fx_rate": FX_OPTIONS,
+        "jessica_start_month": JESS_START_OPTIONS,
+        "bonus_milestone_total": list(COMP_CASES.values()),
+        "cottage_sale_price": COTTAGE_PRICE_OPTIONS,
+    }
+    return get_result_cache().compute_once(
+        content_key("lattice", {"fixed": fixed, "axes": axes}),
+        lambda: load_or_build_lattice(fixed, axes),
+    )
+
+
+def pooled(kind, payload, compute, label):
+    """Result of ``compute(should_stop)`` from the shared compute service.
+
+    Call it only for panels the user has switched on: expander bodies run on
+    every rerun, collapsed or not, so an ungated call queues a job each time.
+    Shows the job's queue position while waiting. A rerun interrupts the
+    wait and releases this session's claim, which cancels the job unless
+    another session is waiting for the same result. Returns None, with a
+    warning, when the queue is full.
+    """
+    try:
+        ticket = compute_service.submit(kind, payload, compute, owner=session_id)
+    except RuntimeError as exc:
+        st.warning(f"{label} skipped: {exc}. Try again shortly.")
+        return None
+    status = st.empty()
+    try:
+        while not ticket.wait(0.25):
+            status.caption(f"{label}: {ticket.status()}")
+        return ticket.result()
+    finally:
+        ticket.release()
+        status.empty()
+
+
+# Opt-in profiling of every rerun; the toggle lives at the bottom of the sidebar
+PROFILE_DEFAULT = os.environ.get("FORWARD_FLOW_PROFILE", "") == "1"
+if "profiler" not in st.session_state:
+    st.session_state["profiler"] = Profiler()
+profiler = st.session_state["profiler"]
+profiler.set_enabled(st.session_state.get("profile", PROFILE_DEFAULT))
+profiler.start_rerun()
+
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+session_id = st.session_state["session_id"]
+compute_service = get_compute_service()
+
+stage("page_config")
 st.set_page_config(layout="wide")
 
 # Minimalistic header font style and sidebar background
@@ -24,184 +136,7 @@ section[data-testid="stSidebar"] {
 """, unsafe_allow_html=True)
 
 
-def run_simulation(
-    jack_income_usd,
-    fx_rate,
-    jessica_income_cad,
-    jessica_start_month,
-    bonus_milestone_total,
-    start_savings,
-    cottage_sale_price,
-    loan_repay_month="2026-12",
-):
-    heloc_bal = 330000
-    cash = start_savings
-    cra_rate = 0.0938
-    heloc_rate = 0.0545
-    expenses = 18700
-
-    bonus_month = "2025-07"
-    refund_month = "2025-10"
-    cottage_month = "2025-10"
-    refund = 28046
-    cottage = 135000
-
-    jack_income_cad = jack_income_usd * fx_rate
-    data = []
-    cra_bal = 170000  # Assuming initial CRA balance, as it was missing
-    cra_paid_off = False
-    heloc_paid_off = False
-
-    months = pd.date_range("2024-06", "2027-01", freq="MS")
-
-    for m in months:
-        m_str = m.strftime("%Y-%m")
-        j_income = jessica_income_cad if m_str >= jessica_start_month else 0
-        inflow = jack_income_cad + j_income + 3400  # includes rental income
-        if m_str >= "2025-11":
-            monthly_expenses = expenses - 1700  # remove cottage mortgage after sale
-        else:
-            monthly_expenses = expenses
-        net = inflow - monthly_expenses
-        if m.year == 2026:
-            net += 1200  # FTC benefit begins in 2026
-
-        labels = []
-
-        # Apply bonus and loan
-        if m_str == bonus_month:
-            bonus_amount = 50000 + bonus_milestone_total  # confirmed + future milestone bonuses
-            loan_amount = 50000
-
-            # Apply bonus to CRA first
-            if cra_bal > 0:
-                applied = min(bonus_amount, cra_bal)
-                cra_bal -= applied
-                bonus_amount -= applied
-            if bonus_amount > 0 and heloc_bal > 0:
-                applied = min(bonus_amount, heloc_bal)
-                heloc_bal -= applied
-            # Add loan amount directly to cash
-            cash += loan_amount
-
-        # Apply refund to CRA first
-        if m_str == refund_month:
-            if cra_bal > 0:
-                applied = min(refund, cra_bal)
-                cra_bal -= applied
-                remainder = refund - applied
-                heloc_bal -= remainder
-            else:
-                heloc_bal -= refund
-
-        # Apply cottage proceeds to CRA first
-        if m_str == cottage_month:
-            labels.append("Cottage Sale")
-            net_cottage_proceeds = cottage_sale_price - 285000  # 245K mortgage + 40K tax estimate
-            if cra_bal > 0:
-                applied = min(net_cottage_proceeds, cra_bal)
-                cra_bal -= applied
-                remainder = net_cottage_proceeds - applied
-                if heloc_bal > 0:
-                    applied_heloc = min(remainder, heloc_bal)
-                    heloc_bal -= applied_heloc
-                    cash += remainder - applied_heloc
-                else:
-                    cash += remainder
-            else:
-                if heloc_bal > 0:
-                    applied_heloc = min(net_cottage_proceeds, heloc_bal)
-                    heloc_bal -= applied_heloc
-                    cash += net_cottage_proceeds - applied_heloc
-                else:
-                    cash += net_cottage_proceeds
-            # add $420K sale proceeds, $135K goes to debt as before, rest used for taxes + capital gains
-            # assume $12K tax bill appears following month
-        elif m_str == "2025-11":
-            labels.append("Capital Gains Tax Paid")
-            cash -= 12000
-
-        # Interest accrual
-        cra_int = max(0, cra_bal * cra_rate / 12)
-        heloc_int = heloc_bal * heloc_rate / 12
-
-        # Add income, subtract interest, then apply surplus to debt
-        cash += net
-
-        reserved_for_loan = 50000 if m_str >= "2025-07" and m_str < loan_repay_month else 0
-        available_cash = max(cash - reserved_for_loan, 0)
-
-        # CRA interest accrues regardless of ability to pay
-        cra_int = max(0, cra_bal * cra_rate / 12)
-
-        # Subtract interest from available_cash if affordable
-        if available_cash >= cra_int:
-            available_cash -= cra_int
-        else:
-            available_cash = 0  # Interest is still owed but cash is gone
-            available_cash -= heloc_int
-        if available_cash < 0:
-            heloc_int += available_cash
-            available_cash = 0
-
-        # Apply loan repayment at end of 2026
-        if m_str == loan_repay_month:
-            labels.append("Loan Repayment")
-            cash -= 50000
-
-        # Apply remaining available_cash to CRA first, then HELOC
-        if available_cash > 0:
-            if cra_bal > 0:
-                applied = min(available_cash, cra_bal)
-                cra_bal -= applied
-                available_cash -= applied
-            if heloc_bal > 0 and available_cash > 0:
-                applied = min(available_cash, heloc_bal)
-                heloc_bal -= applied
-                available_cash -= applied
-
-        # Update cash to reflect payments made from available_cash
-        cash = reserved_for_loan + available_cash
-
-        # Annotations
-        if m_str == "2025-11":
-            labels.append("Capital Gains Tax Paid")
-        if m_str == cottage_month:
-            labels.append("Cottage Sale")
-        if m_str == bonus_month:
-            labels.append("Jack Receives Bonus")
-        if m_str == refund_month:
-            labels.append("ABIL Tax Refund")
-        if m_str == jessica_start_month:
-            labels.append("Jessica Returns to Work")
-        if m_str == "2026-01":
-            labels.append("FTC Relief Begins")
-        if not cra_paid_off and cra_bal <= 0:
-            labels.append("CRA Debt Paid Off")
-            cra_paid_off = True
-        if not heloc_paid_off and heloc_bal <= 0:
-            labels.append("HELOC Paid Off")
-            heloc_paid_off = True
-        label = " | ".join(sorted(set(labels)))
-
-        data.append(
-            {
-                "Month": m_str,
-                "Cash": cash,
-                "CRA Balance": cra_bal,
-                "HELOC Balance": heloc_bal,
-                "CRA Interest": cra_int,
-                "HELOC Interest": heloc_int,
-                "Label": label,
-                "Monthly Surplus": net - cra_int - heloc_int,
-                "Monthly Income": inflow,
-                "Monthly Expenses": monthly_expenses,
-            }
-        )
-
-    return pd.DataFrame(data)
-
-
+stage("sidebar")
 # Sidebar controls
 st.sidebar.title("🧭 Navigate Your Scenario")
 jack_income = st.sidebar.number_input("Jack's Monthly Income (USD)", value=12600)
@@ -209,186 +144,435 @@ fx_rate = st.sidebar.slider(
     "USD to CAD Exchange Rate", min_value=1.2, max_value=1.5, value=1.35, step=0.01
 )
 jess_income = st.sidebar.number_input("Jessica's Monthly Income (CAD)", value=3000)
-jess_start = st.sidebar.selectbox(
-    "Jessica Starts Working",
-    ["2025-07", "2025-08", "2025-09", "2025-10", "2025-11", "2025-12", "2026-01"],
-)
+jess_start = st.sidebar.selectbox("Jessica Starts Working", JESS_START_OPTIONS)
 savings = st.sidebar.number_input("Starting Savings (CAD)", value=20000)
 
 # New: Compensation scenario toggle
-comp_case = st.sidebar.radio("Comp Scenario", ["Base Case", "Best Case"])
-bonus_milestone_total = 150000 if comp_case == "Best Case" else 0
+comp_case = st.sidebar.radio("Comp Scenario", list(COMP_CASES))
+bonus_milestone_total = COMP_CASES[comp_case]
 
 # Cottage sale slider
 cottage_sale_price = st.sidebar.slider(
     "Cottage Sale Price (CAD)", min_value=350000, max_value=450000, value=420000, step=10000
 )
 
-# Run simulation
-df = run_simulation(
-    jack_income,
-    fx_rate,
-    jess_income,
-    jess_start,
-    bonus_milestone_total,
-    savings,
-    cottage_sale_price,
+# Horizon length and interest convention; daily accrual compounds CRA
+# interest daily and charges HELOC interest on the month's actual days
+horizon_end = HORIZON_OPTIONS[st.sidebar.selectbox("Horizon", list(HORIZON_OPTIONS))]
+accrual = ACCRUAL_OPTIONS[st.sidebar.radio("Interest Accrual", list(ACCRUAL_OPTIONS))]
+
+# Monte Carlo mode: stochastic FX, rates and income around the values above
+mc_enabled = st.sidebar.checkbox("Monte Carlo Bands")
+if mc_enabled:
+    with st.sidebar.expander("Monte Carlo Settings", expanded=True):
+        mc_paths = st.select_slider("Paths", options=[10000, 25000, 50000, 100000], value=10000)
+        mc_fx_vol = st.slider("FX Volatility (annual)", min_value=0.0, max_value=0.2, value=0.06, step=0.01)
+        mc_rate_vol = st.slider(
+            "Rate Volatility (annual, absolute)", min_value=0.0, max_value=0.03, value=0.01, step=0.0025,
+            format="%.4f",
+        )
+        mc_income_vol = st.slider("Income Volatility (annual)", min_value=0.0, max_value=0.3, value=0.05, step=0.01)
+        mc_seed = st.number_input("Seed", value=0, step=1)
+        mc_workers = st.number_input("Worker Processes", min_value=1, max_value=os.cpu_count() or 1, value=1)
+
+# Editable event calendar; one row per bonus, refund, sale, bill or cash event
+SCHEDULE_COLUMNS = ["kind", "month", "amount", "deduction", "every", "until", "label"]
+with st.sidebar.expander("Event Schedule"):
+    schedule_df = st.data_editor(
+        pd.DataFrame(DEFAULT_SCHEDULE, columns=SCHEDULE_COLUMNS),
+        num_rows="dynamic",
+        hide_index=True,
+        column_config={"kind": st.column_config.SelectboxColumn(options=EVENT_KINDS, required=True)},
+    )
+# Incomplete or malformed rows (e.g. one just added) are left out with a
+# message rather than stopping the dashboard
+schedule = []
+for k, row in enumerate(schedule_df.to_dict("records")):
+    event = {key: value for key, value in row.items() if not pd.isna(value) and value != ""}
+    if not event:
+        continue
+    try:
+        check_event(event)
+    except ValueError as exc:
+        st.sidebar.error(f"Schedule row {k + 1} ignored: {exc}")
+        continue
+    schedule.append(event)
+
+# Actual spending from a Monarch or bank export in place of the flat expenses;
+# re-uploading a file is a cache hit and a longer export parses only new rows
+imported = None
+with st.sidebar.expander("📥 Imported Expenses"):
+    upload = st.file_uploader("Monarch or Bank CSV Export", type="csv")
+    if upload is not None:
+        try:
+            imported = import_transactions(upload.getvalue())
+        except ValueError as exc:
+            # Missing date/amount columns, an empty file, undecodable text
+            st.error(f"Could not import {upload.name}: {exc}")
+    if imported is not None:
+        imported_categories = sorted({name for by_category in imported["totals"].values() for name in by_category})
+        expense_categories = st.multiselect(
+            "Categories Counted as Expenses", imported_categories, default=imported_categories
+        )
+        use_imported = st.checkbox("Drive Expenses from Import", value=True)
+        st.caption(
+            f"{imported['rows']:,} transactions over {len(imported['totals'])} months "
+            f"({imported['parsed']:,} parsed now, {imported['errors']:,} unreadable)"
+        )
+        st.dataframe(
+            pd.DataFrame(imported["totals"]).T.fillna(0).mean().rename("Monthly Average").to_frame()
+            .style.format("${:,.0f}"),
+            use_container_width=True,
+        )
+
+# Precomputing the lattice turns slider drags over the discrete inputs into lookups
+use_lattice = st.sidebar.checkbox(
+    "Precompute Input Lattice", value=os.environ.get("FORWARD_FLOW_LATTICE", "") == "1"
 )
 
-# Display plots
-st.title("✨ Forward Flow: 2025+ Cash Compass")
-fig = go.Figure()
-fig.add_trace(go.Scatter(
-    x=df["Month"], y=df["Cash"], name="Cash Position",
-    line=dict(color="#4B9CD3")
-))
-fig.add_trace(
-    go.Scatter(
-        x=df["Month"], y=df["CRA Balance"], name="CRA Balance",
-        line=dict(dash="dash", color="#9B59B6")
-    )
+stage("simulation")
+# Run simulation
+inputs = dict(
+    jack_income_usd=jack_income,
+    fx_rate=fx_rate,
+    jessica_income_cad=jess_income,
+    jessica_start_month=jess_start,
+    bonus_milestone_total=bonus_milestone_total,
+    start_savings=savings,
+    cottage_sale_price=cottage_sale_price,
 )
-fig.add_trace(
-    go.Scatter(
-        x=df["Month"], y=df["HELOC Balance"], name="HELOC Balance",
-        line=dict(dash="dot", color="#E74C3C")
+if schedule != DEFAULT_SCHEDULE:
+    inputs["schedule"] = schedule
+if horizon_end != HORIZON_END:
+    inputs["horizon_end"] = horizon_end
+if accrual != "monthly":
+    inputs["accrual"] = accrual
+if imported is not None and use_imported and expense_categories:
+    horizon_events = compile_schedule(schedule, end=horizon_end)
+    try:
+        inputs["expense_path"] = expense_vector(
+            imported["totals"],
+            horizon_events["months"],
+            expense_categories,
+            expense_changes=horizon_events["expense_changes"],
+        )
+    except ValueError as exc:
+        # Every row excluded or unreadable: keep the scheduled expenses
+        st.sidebar.error(f"Imported expenses not used: {exc}")
+result_cache = get_result_cache()
+lattice = get_lattice(jack_income, jess_income, savings) if use_lattice else None
+# Each session keeps its own checkpoints so a change to a late-horizon input
+# only replays the months from where it takes effect
+if "incremental" not in st.session_state:
+    st.session_state["incremental"] = IncrementalSimulation()
+df = cached_simulation(result_cache, inputs, lattice, st.session_state["incremental"].run)
+
+stage("scenarios")
+# Saved scenarios: store the current inputs and results, pick some to overlay
+scenario_store = get_scenario_store()
+with st.sidebar.expander("💾 Saved Scenarios"):
+    scenario_name = st.text_input("Scenario Name", value=f"{comp_case}, Jess {jess_start}, Cottage ${cottage_sale_price:,}")
+    if st.button("Save Scenario"):
+        scenario_store.save(scenario_name, inputs, df)
+    scenario_filter = st.text_input("Filter by Name")
+    saved = scenario_store.list(name_contains=scenario_filter)
+    saved_names = dict(zip(saved["key"], saved["name"]))
+    compare_keys = st.multiselect("Compare", list(saved_names), format_func=saved_names.get)
+compared = {saved_names[key]: scenario_store.load(key) for key in compare_keys}
+
+stage("monte_carlo")
+mc = None
+if mc_enabled:
+    mc_processes = {
+        "fx": {"volatility": mc_fx_vol},
+        "cra_rate": {"volatility": mc_rate_vol},
+        "heloc_rate": {"volatility": mc_rate_vol},
+        "income": {"volatility": mc_income_vol},
+    }
+    mc = pooled(
+        "monte_carlo",
+        {"inputs": inputs, "paths": mc_paths, "processes": mc_processes, "seed": int(mc_seed)},
+        lambda should_stop: run_monte_carlo(
+            inputs,
+            n_paths=mc_paths,
+            processes=mc_processes,
+            seed=int(mc_seed),
+            workers=int(mc_workers),
+            should_stop=should_stop,
+        ),
+        "Monte Carlo",
     )
+
+cache_stats = result_cache.stats()
+st.sidebar.caption(
+    f"Result cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+    f"{cache_stats['lattice_hits']} lattice lookups · {cache_stats['entries']} entries "
+    f"({cache_stats['bytes'] / 1e6:.1f} MB)"
 )
 
+# Display plots. Each chart is a fragment: its display options rerun only
+# that fragment, so the other charts are neither rebuilt nor re-sent. Long
+# series are thinned and drawn with WebGL unless full resolution is asked for.
+@st.fragment
+def balances_chart(df, mc, compared):
+    full = st.toggle("Full Resolution", key="balances_full")
+    stage("figure.balances")
+    fig = balances_figure(df, mc, compared, max_points=None if full else MAX_POINTS)
+    stage("render.balances")
+    st.plotly_chart(fig, use_container_width=True)
+
 
-# Replace per-event stars with a single grouped trace per month
-event_months = df[df["Label"] != ""]
-grouped_labels = event_months.groupby("Month").agg({
-    "Label": lambda x: " | ".join(x),
-    "Cash": "first"
-}).reset_index()
-
-fig.add_trace(
-    go.Scatter(
-        x=grouped_labels["Month"],
-        y=grouped_labels["Cash"],
-        mode="markers",
-        marker=dict(symbol="star", size=14, color="#F4D03F"),
-        name="Key Events",
-        hovertemplate="<b>%{text}</b><br>Month: %{x}<extra></extra>",
-        text=grouped_labels["Label"]
+@st.fragment
+def probability_chart(mc):
+    stage("figure.probability")
+    fig_prob = probability_figure(mc)
+    stage("render.probability")
+    st.plotly_chart(fig_prob, use_container_width=True)
+
+
+@st.fragment
+def interest_chart(df):
+    barmode = st.radio("Interest Bars", ["stack", "group"], format_func=str.title, horizontal=True)
+    stage("figure.interest")
+    fig2 = interest_figure(df, barmode=barmode)
+    stage("render.interest")
+    st.plotly_chart(fig2, use_container_width=True)
+
+
+@st.fragment
+def cashflow_chart(df):
+    show_events = st.toggle("Event Stars", value=True, key="cashflow_events")
+    stage("figure.cashflow")
+    fig_combined = cashflow_figure(df, show_events=show_events)
+    stage("render.cashflow")
+    st.plotly_chart(fig_combined, use_container_width=True)
+
+
+@st.fragment
+def simulation_table(df):
+    rows = st.radio("Rows", ["All Months", "Event Months"], horizontal=True, key="table_rows")
+    table = df if rows == "All Months" else df[df["Label"] != ""]
+    st.dataframe(table.set_index("Month"))
+
+
+st.title("✨ Forward Flow: 2025+ Cash Compass")
+balances_chart(df, mc, compared)
+
+if compared:
+    st.subheader("Scenario Comparison")
+    diff = compare_scenarios({"Current": df, **compared})
+    st.dataframe(
+        diff.style.format({
+            column: "${:,.0f}" for column in diff.columns if "cash" in column or "interest" in column
+        }, na_rep="—"),
+        use_container_width=True,
     )
-)
 
-fig.update_layout(
-    title="Cash and Debt Balances Over Time",
-    xaxis_title="Month",
-    yaxis_title="CAD",
-    height=600,
-    template="simple_white",
-    plot_bgcolor="rgba(0,0,0,0)",
-    paper_bgcolor="rgba(0,0,0,0)",
-    font=dict(color="#333", size=13, family="DM Sans")
-)
-st.plotly_chart(fig, use_container_width=True)
+# Monte Carlo payoff probabilities
+if mc is not None:
+    probability_chart(mc)
 
 # Interest stacked chart
-fig2 = go.Figure()
-fig2.add_trace(go.Bar(
-    x=df["Month"], y=df["CRA Interest"], name="CRA Interest", marker_color="#5DADE2"
-))
-fig2.add_trace(go.Bar(
-    x=df["Month"], y=df["HELOC Interest"], name="HELOC Interest", marker_color="#F5B041"
-))
-fig2.update_layout(
-    barmode="stack",
-    title="Monthly Interest Payments",
-    xaxis_title="Month",
-    yaxis_title="CAD",
-    height=400,
-    template="simple_white",
-    plot_bgcolor="rgba(0,0,0,0)",
-    paper_bgcolor="rgba(0,0,0,0)",
-    font=dict(color="#333", size=13, family="DM Sans")
-)
-st.plotly_chart(fig2, use_container_width=True)
+interest_chart(df)
 
 # Combined income, expenses, and surplus chart
-fig_combined = go.Figure()
-
-fig_combined.add_trace(
-    go.Scatter(
-        x=df["Month"],
-        y=df["Monthly Income"],
-        name="Monthly Income",
-        line=dict(color="#2ECC71"),
-        mode="lines+markers",
-        marker=dict(size=6),
+cashflow_chart(df)
+
+stage("goal_seek")
+# Goal seek: which input values get a debt or cash target met?
+with st.expander("🎯 Goal Seek"):
+    goal_cols = st.columns(3)
+    goal_kind = goal_cols[0].selectbox(
+        "Target", ["CRA paid off by", "HELOC paid off by", "Cash never below"]
     )
-)
-fig_combined.add_trace(
-    go.Scatter(
-        x=df["Month"],
-        y=df["Monthly Expenses"],
-        name="Monthly Expenses",
-        line=dict(color="#F39C12"),
-        mode="lines+markers",
-        marker=dict(size=6),
+    if goal_kind == "Cash never below":
+        goal_value = goal_cols[1].number_input("Minimum Cash (CAD)", value=0, step=5000)
+        targets = {"min_cash": goal_value}
+    else:
+        goal_value = goal_cols[1].selectbox("Month", list(df["Month"]), index=len(df) - 2)
+        targets = {"cra_paid_by" if goal_kind.startswith("CRA") else "heloc_paid_by": goal_value}
+    goal_vars = goal_cols[2].multiselect(
+        "Free Variables",
+        list(VARIABLE_BOUNDS),
+        format_func=VARIABLE_LABELS.get,
+        max_selections=2,
     )
-)
 
-# Surplus positive values in soft seafoam
-fig_combined.add_trace(
-    go.Scatter(
-        x=df["Month"],
-        y=[val if val >= 0 else None for val in df["Monthly Surplus"]],
-        name="Surplus",
-        line=dict(color="#1ABC9C"),
-        mode="lines+markers",
-        marker=dict(size=6),
+    if len(goal_vars) == 1:
+        (var,) = goal_vars
+        solved = result_cache.get_or_compute(
+            "goal_seek",
+            {"inputs": inputs, "targets": targets, "variable": var},
+            lambda: solve_threshold(inputs, var, targets),
+        )
+        lo, hi = VARIABLE_BOUNDS[var]
+        if solved["status"] == "solved":
+            bound = "at least" if solved["direction"] == "min" else "at most"
+            fmt = "{:.4f}" if var == "fx_rate" else "${:,.0f}"
+            st.metric(f"{VARIABLE_LABELS[var]} needed ({bound})", fmt.format(solved["value"]))
+        elif solved["status"] == "always":
+            st.success(f"Target is met for every {VARIABLE_LABELS[var]} from {lo:,.2f} to {hi:,.2f}.")
+        else:
+            st.warning(f"Target cannot be met with {VARIABLE_LABELS[var]} anywhere from {lo:,.2f} to {hi:,.2f}.")
+    elif len(goal_vars) == 2 and st.checkbox("Map Feasibility Frontier"):
+        frontier = pooled(
+            "goal_frontier",
+            {"inputs": inputs, "targets": targets, "variables": goal_vars},
+            lambda should_stop: feasibility_frontier(inputs, goal_vars, targets),
+            "Feasibility frontier",
+        )
+        if frontier is not None:
+            fig_goal = go.Figure()
+            fig_goal.add_trace(go.Heatmap(
+                x=frontier["x"], y=frontier["y"], z=frontier["feasible"].astype(int),
+                colorscale=[[0, "rgba(231,76,60,0.15)"], [1, "rgba(46,204,113,0.25)"]],
+                showscale=False, hoverinfo="skip",
+            ))
+            fig_goal.add_trace(go.Scatter(
+                x=frontier["x"], y=frontier["frontier"], name="Frontier",
+                line=dict(color="#333", width=2),
+            ))
+            fig_goal.update_layout(
+                title="Feasibility Frontier (green = target met)",
+                xaxis_title=VARIABLE_LABELS[goal_vars[0]],
+                yaxis_title=VARIABLE_LABELS[goal_vars[1]],
+                height=450,
+                template="simple_white",
+                plot_bgcolor="rgba(0,0,0,0)",
+                paper_bgcolor="rgba(0,0,0,0)",
+                font=dict(color="#333", size=13, family="DM Sans")
+            )
+            st.plotly_chart(fig_goal, use_container_width=True)
+
+stage("sensitivity")
+with st.expander("📐 What Moves the Needle"):
+    needle_cols = st.columns(2)
+    needle_pct = needle_cols[0].slider("Perturbation (±%)", min_value=1, max_value=50, value=10) / 100
+    needle_metric = needle_cols[1].selectbox(
+        "Outcome", list(METRIC_LABELS), format_func=METRIC_LABELS.get, key="needle_metric"
     )
-)
-# Surplus negative values in rose red (deficit)
-fig_combined.add_trace(
-    go.Scatter(
-        x=df["Month"],
-        y=[val if val < 0 else None for val in df["Monthly Surplus"]],
-        name="Deficit",
-        line=dict(color="#E74C3C"),
-        mode="lines+markers",
-        marker=dict(size=6),
+    if st.checkbox("Show Tornado"):
+        swings = pooled(
+            "tornado",
+            {"inputs": inputs, "pct": needle_pct},
+            lambda should_stop: tornado(inputs, needle_pct),
+            "Sensitivity",
+        )
+        if swings is not None:
+            low, high = swings["low"][needle_metric], swings["high"][needle_metric]
+            order = np.argsort(np.maximum(np.abs(low), np.abs(high)))
+            bar_labels = [SENSITIVITY_LABELS[swings["names"][k]] for k in order]
+            fig_tornado = go.Figure()
+            fig_tornado.add_trace(go.Bar(
+                y=bar_labels, x=low[order], orientation="h", name=f"-{needle_pct:.0%}", marker_color="#E74C3C"
+            ))
+            fig_tornado.add_trace(go.Bar(
+                y=bar_labels, x=high[order], orientation="h", name=f"+{needle_pct:.0%}", marker_color="#2ECC71"
+            ))
+            fig_tornado.update_layout(
+                title=f"Change in {METRIC_LABELS[needle_metric]} (base {swings['base'][needle_metric]:,.0f})",
+                barmode="overlay",
+                height=450,
+                template="simple_white",
+                plot_bgcolor="rgba(0,0,0,0)",
+                paper_bgcolor="rgba(0,0,0,0)",
+                font=dict(color="#333", size=13, family="DM Sans")
+            )
+            st.plotly_chart(fig_tornado, use_container_width=True)
+
+    if st.checkbox("Show Pairwise Interaction"):
+        pair_cols = st.columns(2)
+        pair_x = pair_cols[0].selectbox(
+            "First Input", list(SENSITIVITY_LABELS), format_func=SENSITIVITY_LABELS.get, key="pair_x"
+        )
+        pair_y = pair_cols[1].selectbox(
+            "Second Input", [name for name in SENSITIVITY_LABELS if name != pair_x],
+            format_func=SENSITIVITY_LABELS.get, key="pair_y",
+        )
+        grid = pooled(
+            "interaction",
+            {"inputs": inputs, "pct": needle_pct, "pair": [pair_x, pair_y]},
+            lambda should_stop: interaction_grid(inputs, (pair_x, pair_y), needle_pct),
+            "Interaction grid",
+        )
+        if grid is not None:
+            axis = [f"{offset:+.1%}" for offset in grid["offsets"]]
+            fig_pair = go.Figure(go.Heatmap(
+                x=axis, y=axis, z=grid["interaction"][needle_metric],
+                colorscale="RdBu", zmid=0,
+            ))
+            fig_pair.update_layout(
+                title=f"Interaction Effect on {METRIC_LABELS[needle_metric]} (joint change less individual changes)",
+                xaxis_title=SENSITIVITY_LABELS[pair_x],
+                yaxis_title=SENSITIVITY_LABELS[pair_y],
+                height=450,
+                template="simple_white",
+                plot_bgcolor="rgba(0,0,0,0)",
+                paper_bgcolor="rgba(0,0,0,0)",
+                font=dict(color="#333", size=13, family="DM Sans")
+            )
+            st.plotly_chart(fig_pair, use_container_width=True)
+
+stage("optimizer")
+with st.expander("🧮 Debt Allocation Optimizer"):
+    opt_cols = st.columns(3)
+    opt_objective = opt_cols[0].radio(
+        "Objective", ["interest", "debt_free"],
+        format_func={"interest": "Minimise total interest", "debt_free": "Debt-free soonest"}.get,
     )
-)
-
-
-# Add grouped star markers for key events per month on surplus line for context
-event_months = df[df["Label"] != ""]
-grouped_labels2 = event_months.groupby("Month").agg({
-    "Label": lambda x: " | ".join(x),
-    "Monthly Surplus": "first"
-}).reset_index()
-fig_combined.add_trace(
-    go.Scatter(
-        x=grouped_labels2["Month"],
-        y=[y if not pd.isna(y) else 0 for y in grouped_labels2["Monthly Surplus"]],
-        mode="markers",
-        marker=dict(symbol="star", size=14, color="#F4D03F"),
-        name="Key Events",
-        hovertemplate="<b>%{text}</b><br>Month: %{x}<extra></extra>",
-        text=grouped_labels2["Label"],
-        showlegend=True,
+    opt_min_cash = opt_cols[1].number_input("Cash Floor (CAD)", value=0, step=5000, key="opt_min_cash")
+    opt_deadline = opt_cols[2].selectbox(
+        "Repay Loan By", list(df["Month"]), index=len(df) - 1, key="opt_deadline"
     )
-)
-
-fig_combined.update_layout(
-    title="Monthly Income, Expenses, and Surplus",
-    xaxis_title="Month",
-    yaxis_title="CAD",
-    height=500,
-    hovermode="x unified",
-    template="simple_white",
-    plot_bgcolor="rgba(0,0,0,0)",
-    paper_bgcolor="rgba(0,0,0,0)",
-    font=dict(color="#333", size=13, family="DM Sans")
-)
-
-st.plotly_chart(fig_combined, use_container_width=True)
-
+    if st.checkbox("Run Optimizer"):
+        allocation = pooled(
+            "allocation",
+            {"inputs": inputs, "objective": opt_objective, "min_cash": opt_min_cash, "deadline": opt_deadline},
+            lambda should_stop: optimize_allocation(
+                inputs, objective=opt_objective, min_cash=opt_min_cash, latest_repay_month=opt_deadline,
+                should_stop=should_stop,
+            ),
+            "Optimizer",
+        )
+        if allocation is not None:
+            optimal, current = allocation["optimal"], allocation["current"]
+            # The optimizer pays every month's interest out of cash, letting
+            # cash go negative, where the engine forgives interest it cannot
+            # pay; its figures are therefore not the charts' figures
+            st.caption(
+                "Figures below use the optimizer's cash model, which pays all interest from cash even "
+                "when that takes cash below zero. The charts above forgive interest that cannot be paid "
+                f"and total ${df['CRA Interest'].sum() + df['HELOC Interest'].sum():,.0f} of interest."
+            )
+            saved = allocation["interest_saved"]
+            metric_cols = st.columns(4)
+            metric_cols[0].metric("Current Rule Interest (model)", f"${current['total_interest']:,.0f}")
+            metric_cols[1].metric(
+                "Optimal Interest (model)", f"${optimal['total_interest']:,.0f}",
+                delta=f"-${saved:,.0f}" if saved >= 0 else f"+${-saved:,.0f}", delta_color="inverse",
+            )
+            metric_cols[2].metric(
+                "Debt Free", optimal["debt_free_month"] or "Not in horizon",
+                delta=f"current: {current['debt_free_month'] or 'not in horizon'}", delta_color="off",
+            )
+            metric_cols[3].metric("Repay Loan In", allocation["loan_repay_month"] or "—")
+            if not allocation["feasible"]:
+                st.warning(
+                    f"In the optimizer's model no allocation keeps cash above ${opt_min_cash:,.0f} every month; "
+                    f"this schedule minimises the shortfall (lowest cash {'-' if optimal['min_cash'] < 0 else ''}${abs(optimal['min_cash']):,.0f})."
+                )
+            st.dataframe(
+                pd.DataFrame({
+                    name: optimal[name]
+                    for name in ("Month", "Pay CRA", "Pay HELOC", "Loan Repayment", "Cash", "CRA Balance", "HELOC Balance", "Interest")
+                }).style.format({
+                    name: "${:,.0f}"
+                    for name in ("Pay CRA", "Pay HELOC", "Loan Repayment", "Cash", "CRA Balance", "HELOC Balance", "Interest")
+                }),
+                use_container_width=True,
+            )
+
+stage("assumptions")
 # Assumptions Sidebar Section
 with st.expander("🔍 Model Assumptions + Flow Notes", expanded=True):
     st.markdown(
@@ -402,8 +586,8 @@ with st.expander("🔍 Model Assumptions + Flow Notes", expanded=True):
 - **Bonus & Loan:** $50K bonus + $50K interest-free loan in July 2025 (loan repaid Dec 2026)
 - **Tax Refund:** $28,046 CAD in Oct 2025 (from ABIL claim)
 - **Cottage Sale:** $420K in Oct 2025; $135K applied to debt; $12K tax due in April 2026
-- **CRA Interest Rate:** 9.38% annually, monthly compounding
-- **HELOC Interest Rate:** 5.45% annually, monthly compounding
+- **CRA Interest Rate:** 9.38% annually; rate ÷ 12 each month, or compounded daily (actual/365) under daily accrual
+- **HELOC Interest Rate:** 5.45% annually; rate ÷ 12 each month, or simple daily interest (actual/365) billed monthly under daily accrual
 - **U.S. FTC Relief:** +$1,200/month from Jan 2026 due to Canadian capital gains
 
 ### 📊 Cash Flow Logic
@@ -414,6 +598,7 @@ with st.expander("🔍 Model Assumptions + Flow Notes", expanded=True):
         """
     )
 
+stage("summary_table")
 # Expense and Income Summary Table
 summary_data = {
     "Category": [
@@ -447,6 +632,44 @@ sum_df = pd.DataFrame(summary_data)
 st.markdown("### 📊 Monthly Income and Expense Breakdown")
 st.table(sum_df.set_index("Category"))
 
+stage("data_table")
 # Data Table
 st.markdown("### 📅 Monthly Financial Simulation Table")
-st.dataframe(df.set_index("Month"))
+simulation_table(df)
+profiler.finish_rerun()
+
+# Profiling panel: per-stage timings and allocations over recent reruns
+with st.sidebar.expander("⏱ Profiling"):
+    st.checkbox("Profile Reruns", value=PROFILE_DEFAULT, key="profile")
+    if profiler.enabled and profiler.reruns:
+        st.dataframe(
+            pd.DataFrame(profiler.summary()).style.format(
+                {"Last ms": "{:.1f}", "p50 ms": "{:.1f}", "p95 ms": "{:.1f}", "Alloc KB": "{:,.0f}", "Peak KB": "{:,.0f}"},
+                na_rep="—",
+            ),
+            hide_index=True,
+        )
+        st.caption(f"Rolling over the last {len(profiler.reruns)} reruns")
+        st.download_button("Download JSONL", profiler.to_jsonl(), "profile.jsonl", "application/x-ndjson")
+        st.download_button("Download Chrome Trace", profiler.to_chrome_trace(), "profile-trace.json", "application/json")
+
+# Admin panel: the shared compute service and result cache across all sessions
+with st.sidebar.expander("🛠 Compute Service"):
+    service_stats = compute_service.stats()
+    service_cache = service_stats["cache"]
+    admin_cols = st.columns(2)
+    admin_cols[0].metric("Queue Depth", service_stats["queued"])
+    admin_cols[1].metric("In Flight", f"{service_stats['running']} / {service_stats['workers']}")
+    admin_cols[0].metric("Coalesced", service_stats["coalesced"] + service_cache["coalesced"])
+    admin_cols[1].metric("Cancelled", service_stats["cancelled"])
+    st.metric(
+        "Cache Memory",
+        f"{service_cache['bytes'] / 2**20:,.1f} / {service_cache['max_bytes'] / 2**20:,.0f} MB",
+        delta=f"{service_cache['evictions']} evictions",
+        delta_color="off",
+    )
+    st.caption(
+        f"{service_stats['completed']} jobs completed · {service_stats['failed']} failed · "
+        f"{service_stats['waiting_sessions']} session waits · oldest job {service_stats['oldest_job_s']:.1f}s · "
+        f"{service_cache['entries']} cache entries"
+    )
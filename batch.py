@@ -0,0 +1,240 @@
+# Headless batch runner: JSONL scenarios in, per-scenario summaries out
+#
+#   python batch.py scenarios.jsonl results/ [--format parquet|csv]
+#       [--workers 4] [--chunk-size 1000] [--max-in-flight 8]
+#
+# Each input line is a JSON object of run_simulation keyword arguments;
+# blank lines are skipped. The output directory gets one part file per chunk
+# of input lines (readable as a dataset with pandas.read_parquet /
+# pyarrow.dataset), each row holding the line number, debt-free month, total
+# interest, minimum and final cash, or the error that scenario raised. Parts
+# are written atomically, so an interrupted run picks up where it left off
+# when started again with the same, unchanged input.
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+from engine import run_simulation_batch
+
+SUMMARY_COLUMNS = ["line", "debt_free_month", "total_interest", "min_cash", "final_cash", "error"]
+FORMATS = ("parquet", "csv")
+_META = "_batch.json"
+# Arguments every scenario of a batch call must share, passed as scalars
+_SHARED_ARGUMENTS = ("schedule", "horizon_end", "accrual")
+
+
+def read_chunks(path, chunk_size, skip=()):
+    """Yield ``(index, lines)`` for consecutive ``chunk_size`` line blocks of
+    ``path``, reading lazily; chunk indices in ``skip`` are not yielded."""
+    with open(path) as f:
+        for index in itertools.count():
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                return
+            if index not in skip:
+                yield index, lines
+
+
+def _summaries(result):
+    # Per-scenario summary columns of one run_simulation_batch result
+    cra = result["CRA Paid Off"]
+    heloc = result["HELOC Paid Off"]
+    debt_free = np.where((cra >= 0) & (heloc >= 0), np.maximum(cra, heloc), -1)
+    months = result["Month"]
+    return {
+        "debt_free_month": [str(months[t]) if t >= 0 else None for t in debt_free],
+        "total_interest": (result["CRA Interest"].sum(axis=1) + result["HELOC Interest"].sum(axis=1)).tolist(),
+        "min_cash": result["Cash"].min(axis=1).tolist(),
+        "final_cash": result["Cash"][:, -1].tolist(),
+    }
+
+
+def _run_group(scenarios):
+    # Scenarios sharing a schedule, horizon, accrual mode and argument names
+    # run as one batch; if that fails the group is halved until the bad
+    # lines are isolated, so one bad line costs a few extra batch calls
+    names = list(scenarios[0])
+    try:
+        inputs = {name: np.array([s[name] for s in scenarios]) for name in names if name not in _SHARED_ARGUMENTS}
+        for name in _SHARED_ARGUMENTS:
+            if name in scenarios[0]:
+                inputs[name] = scenarios[0][name]
+        summary = _summaries(run_simulation_batch(**inputs))
+        return [dict(zip(summary, row), error=None) for row in zip(*summary.values())]
+    except Exception as exc:
+        if len(scenarios) == 1:
+            return [{"error": f"{type(exc).__name__}: {exc}"}]
+        half = len(scenarios) // 2
+        return _run_group(scenarios[:half]) + _run_group(scenarios[half:])
+
+
+def run_chunk(index, first_line, lines):
+    """Simulate one chunk of JSONL lines; returns ``(index, columns)``."""
+    rows = [None] * len(lines)
+    groups = {}
+    for k, line in enumerate(lines):
+        if not line.strip():
+            continue  # Blank lines (e.g. a trailing newline) get no row
+        try:
+            scenario = json.loads(line)
+            if not isinstance(scenario, dict):
+                raise ValueError("scenario must be a JSON object")
+        except ValueError as exc:
+            rows[k] = {"error": f"{type(exc).__name__}: {exc}"}
+            continue
+        key = (
+            json.dumps(scenario.get("schedule"), sort_keys=True),
+            scenario.get("horizon_end"),
+            scenario.get("accrual"),
+            tuple(sorted(scenario)),
+        )
+        groups.setdefault(key, []).append((k, scenario))
+    for members in groups.values():
+        for (k, _), row in zip(members, _run_group([s for _, s in members])):
+            rows[k] = row
+    columns = {name: [] for name in SUMMARY_COLUMNS}
+    for k, row in enumerate(rows):
+        if row is None:
+            continue
+        columns["line"].append(first_line + k + 1)
+        for name in SUMMARY_COLUMNS[1:]:
+            columns[name].append(row.get(name))
+    return index, columns
+
+
+def _part_path(out_dir, index, fmt):
+    return os.path.join(out_dir, f"part-{index:06d}.{fmt}")
+
+
+def write_part(out_dir, index, columns, fmt):
+    import pyarrow as pa
+
+    table = pa.table({
+        "line": pa.array(columns["line"], pa.int64()),
+        "debt_free_month": pa.array(columns["debt_free_month"], pa.string()),
+        "total_interest": pa.array(columns["total_interest"], pa.float64()),
+        "min_cash": pa.array(columns["min_cash"], pa.float64()),
+        "final_cash": pa.array(columns["final_cash"], pa.float64()),
+        "error": pa.array(columns["error"], pa.string()),
+    })
+    path = _part_path(out_dir, index, fmt)
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, tmp)
+    else:
+        import pyarrow.csv as pacsv
+
+        pacsv.write_csv(table, tmp)
+    os.replace(tmp, path)
+
+
+def completed_chunks(out_dir, fmt):
+    """Indices of the chunks whose part file is already in ``out_dir``."""
+    prefix, suffix = "part-", f".{fmt}"
+    return {
+        int(name[len(prefix):-len(suffix)])
+        for name in os.listdir(out_dir)
+        if name.startswith(prefix) and name.endswith(suffix)
+    }
+
+
+def run_batch(input_path, out_dir, fmt="parquet", workers=1, chunk_size=1000, max_in_flight=None, log=None):
+    """Stream ``input_path`` through the engine into part files in ``out_dir``.
+
+    At most ``max_in_flight`` chunks (default twice the workers) are read
+    and not yet written at any time, so memory stays bounded by the chunk
+    size whatever the input length. Returns the number of chunks written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    os.makedirs(out_dir, exist_ok=True)
+    # The input's size and modification time tell an edited file from the
+    # one the existing part files were computed from
+    stat = os.stat(input_path)
+    meta = {
+        "input": os.path.abspath(input_path),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "chunk_size": chunk_size,
+        "format": fmt,
+    }
+    meta_path = os.path.join(out_dir, _META)
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            previous = json.load(f)
+        changed = {name for name in meta if previous.get(name) != meta[name]}
+        if changed and changed <= {"input_size", "input_mtime_ns"}:
+            raise ValueError(f"{input_path} changed since the run in {out_dir} started; use a new output directory")
+        if changed:
+            raise ValueError(f"{out_dir} holds a run with different settings: {previous}")
+    else:
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+
+    done = completed_chunks(out_dir, fmt)
+    if log and done:
+        log(f"resuming: {len(done)} chunks already written")
+    chunks = read_chunks(input_path, chunk_size, skip=done)
+    max_in_flight = max_in_flight or 2 * workers
+    written = 0
+
+    if workers <= 1:
+        for index, lines in chunks:
+            write_part(out_dir, *run_chunk(index, index * chunk_size, lines), fmt)
+            written += 1
+            if log:
+                log(f"chunk {index} written")
+        return written
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        pending = set()
+        for index, lines in chunks:
+            if len(pending) >= max_in_flight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write_part(out_dir, *future.result(), fmt)
+                    written += 1
+                    if log:
+                        log(f"chunk {future.result()[0]} written")
+            pending.add(pool.submit(run_chunk, index, index * chunk_size, lines))
+        for future in pending:
+            write_part(out_dir, *future.result(), fmt)
+            written += 1
+            if log:
+                log(f"chunk {future.result()[0]} written")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run JSONL scenarios through the simulation engine")
+    parser.add_argument("input", help="JSONL file, one object of run_simulation arguments per line")
+    parser.add_argument("out_dir", help="directory for the part files (reused to resume)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--max-in-flight", type=int, help="chunks read but not yet written (default 2x workers)")
+    args = parser.parse_args(argv)
+    written = run_batch(
+        args.input,
+        args.out_dir,
+        fmt=args.format,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        max_in_flight=args.max_in_flight,
+        log=lambda message: print(message, file=sys.stderr, flush=True),
+    )
+    print(f"{written} chunks written to {args.out_dir}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
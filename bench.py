@@ -0,0 +1,438 @@
+# Benchmark suite: simulation engine, figure construction and full app reruns
+#
+#   python bench.py run [--suite engine figures app] [--out bench_results.json]
+#   python bench.py run --save-baseline
+#   python bench.py compare [bench_results.json] [--threshold 0.1]
+#   python bench.py imports [--module engine batch] [--top 8]
+#   python bench.py memory [--months 360 6000]
+#
+# Everything runs locally; the app suite drives app.py through Streamlit's
+# headless AppTest harness, so no browser or network is needed.
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT, "app.py")
+BASELINE_PATH = os.path.join(ROOT, "bench_baseline.json")
+RESULTS_PATH = os.path.join(ROOT, "bench_results.json")
+
+# Horizon lengths in months (32 is the dashboard's own horizon) and batch sizes
+HORIZONS = [32, 120, 360, 600]
+SCENARIO_COUNTS = [1, 100, 1000, 10000]
+# Batch cases above this many scenario-months are skipped to bound memory
+MAX_CELLS = 1_000_000
+
+# Cold-import budgets in milliseconds (cumulative ``-X importtime``) and the
+# packages each module must not load: the engine and the transaction
+# importer are stdlib-only, and the compute modules stay clear of the UI stack
+IMPORT_BUDGETS = {
+    "engine": 100,
+    "batch": 250,
+    "cache": 250,
+    "montecarlo": 250,
+    "solver": 250,
+    "optimizer": 250,
+    "sensitivity": 250,
+    "service": 250,
+    "transactions": 100,
+}
+UI_PACKAGES = ("pandas", "plotly", "streamlit", "pyarrow")
+STDLIB_ONLY = ("engine", "transactions")
+FORBIDDEN_IMPORTS = {
+    module: ("numpy",) + UI_PACKAGES if module in STDLIB_ONLY else UI_PACKAGES for module in IMPORT_BUDGETS
+}
+# Horizons for the memory comparison of per-row records and columnar results
+MEMORY_HORIZONS = [360, 6000]
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+BASE_INPUTS = dict(
+    jack_income_usd=12600,
+    fx_rate=1.35,
+    jessica_income_cad=3000,
+    jessica_start_month="2025-07",
+    bonus_milestone_total=0,
+    start_savings=20000,
+    cottage_sale_price=420000,
+)
+
+
+def horizon_end(n_months):
+    """The "YYYY-MM" month ending an ``n_months`` horizon from ``HORIZON_START``."""
+    from engine import HORIZON_START
+
+    year, month = map(int, HORIZON_START.split("-"))
+    total = year * 12 + month - 1 + n_months - 1
+    return f"{total // 12:04d}-{total % 12 + 1:02d}"
+
+
+def measure(fn, repeat=5, min_time=0.2):
+    """Time ``fn`` like ``timeit``: loop it until a sample takes at least
+    ``min_time`` seconds, then take ``repeat`` samples. Times are per call."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 16:
+            break
+        number *= 2
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {"min": min(samples), "median": statistics.median(samples), "number": number, "repeat": repeat}
+
+
+def engine_cases():
+    from engine import run_simulation, run_simulation_batch
+
+    for n_months in HORIZONS:
+        end = horizon_end(n_months)
+        yield f"engine.scalar[{n_months}m]", lambda end=end: run_simulation(**BASE_INPUTS, horizon_end=end)
+        for n in SCENARIO_COUNTS:
+            if n * n_months > MAX_CELLS:
+                continue
+            inputs = dict(BASE_INPUTS, fx_rate=np.linspace(1.2, 1.5, n))
+            yield (
+                f"engine.batch[{n_months}m x {n}]",
+                lambda inputs=inputs, end=end: run_simulation_batch(**inputs, horizon_end=end),
+            )
+    # Daily actual/365 accrual over the 30-year horizon
+    end = horizon_end(360)
+    inputs = dict(BASE_INPUTS, fx_rate=np.linspace(1.2, 1.5, 1000))
+    yield "engine.scalar_daily[360m]", lambda: run_simulation(**BASE_INPUTS, horizon_end=end, accrual="daily")
+    yield (
+        "engine.batch_daily[360m x 1000]",
+        lambda: run_simulation_batch(**inputs, horizon_end=end, accrual="daily"),
+    )
+
+
+def figure_cases():
+    from engine import run_simulation
+    from figures import (
+        balances_figure,
+        cashflow_figure,
+        event_points,
+        interest_figure,
+        probability_figure,
+        surplus_split,
+    )
+    from montecarlo import run_monte_carlo
+
+    # 6000 months exercises the thinned, WebGL path for very long series
+    for n_months in (32, 600, 6000):
+        df = run_simulation(**BASE_INPUTS, horizon_end=horizon_end(n_months))
+        yield f"figures.balances[{n_months}m]", lambda df=df: balances_figure(df)
+        yield f"figures.interest[{n_months}m]", lambda df=df: interest_figure(df)
+        yield f"figures.cashflow[{n_months}m]", lambda df=df: cashflow_figure(df)
+        yield f"figures.surplus_split[{n_months}m]", lambda df=df: surplus_split(df)
+        # The balances and cash-flow charts each read the labelled months
+        yield (
+            f"figures.event_points_x2[{n_months}m]",
+            lambda df=df: (event_points(df, "Cash"), event_points(df, "Monthly Surplus")),
+        )
+    mc = run_monte_carlo(BASE_INPUTS, n_paths=2000, chunk_size=2000)
+    df = run_simulation(**BASE_INPUTS)
+    yield "figures.probability[32m]", lambda: probability_figure(mc)
+    yield "figures.balances_mc[32m]", lambda: balances_figure(df, mc)
+
+
+def app_cases():
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.pop("FORWARD_FLOW_LATTICE", None)
+
+    def cold_run():
+        # Fresh session with the shared caches emptied: every result is computed
+        st.cache_resource.clear()
+        AppTest.from_file(APP_PATH, default_timeout=300).run()
+
+    warm = AppTest.from_file(APP_PATH, default_timeout=300).run()
+    fx_slider = next(s for s in warm.slider if s.label == "USD to CAD Exchange Rate")
+
+    def rerun():
+        # Input change in a live session, alternating between two values
+        fx_slider.set_value(1.36 if fx_slider.value == 1.35 else 1.35).run()
+
+    yield "app.cold_run", cold_run
+    yield "app.rerun", rerun
+
+
+SUITES = {"engine": engine_cases, "figures": figure_cases, "app": app_cases}
+
+
+def run_suites(suites, repeat=5, pattern=None):
+    import pandas as pd
+    import plotly
+    import streamlit
+
+    results = {}
+    for suite in suites:
+        for name, fn in SUITES[suite]():
+            if pattern and pattern not in name:
+                continue
+            results[name] = measure(fn, repeat=3 if suite == "app" else repeat)
+            print(f"{name:<40} {results[name]['min'] * 1e3:10.3f} ms", flush=True)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "plotly": plotly.__version__,
+            "streamlit": streamlit.__version__,
+            "suites": list(suites),
+            "filter": pattern,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """Rows of (case, baseline s, current s, ratio, status) on the ``min`` times.
+
+    A case regresses when it is more than ``threshold`` (a fraction) slower.
+    A baseline case the current run should have measured but did not is
+    "missing" (renamed or dropped); one outside the run's ``--suite`` /
+    ``--filter`` selection is "skipped".
+    """
+    suites = current["meta"].get("suites", list(SUITES))
+    pattern = current["meta"].get("filter")
+    rows = []
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        before = baseline["results"].get(name)
+        after = current["results"].get(name)
+        if before is None:
+            rows.append((name, None, after["min"], None, "new"))
+            continue
+        if after is None:
+            selected = name.split(".")[0] in suites and (not pattern or pattern in name)
+            rows.append((name, before["min"], None, None, "missing" if selected else "skipped"))
+            continue
+        ratio = after["min"] / before["min"]
+        status = "REGRESSION" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else "ok"
+        rows.append((name, before["min"], after["min"], ratio, status))
+    return rows
+
+
+def traced_memory(fn):
+    """``(peak, retained)`` bytes allocated while ``fn()`` runs: the
+    high-water mark and what its result still holds afterwards.
+
+    tracemalloc does not see Arrow's memory pool (string columns built
+    through Arrow, for one), so the pool's growth is added to both figures.
+    Its peak is the pool's high-water mark when ``fn`` raised it and what
+    ``fn`` left allocated otherwise, so the Arrow part of the peak is a lower
+    bound.
+    """
+    import gc
+    import tracemalloc
+
+    import pyarrow as pa
+
+    gc.collect()
+    pool = pa.default_memory_pool()
+    arrow_start, arrow_max = pa.total_allocated_bytes(), pool.max_memory()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    arrow_kept = pa.total_allocated_bytes() - arrow_start
+    arrow_peak = max(arrow_kept, pool.max_memory() - arrow_start if pool.max_memory() > arrow_max else 0)
+    del result
+    return peak - start + arrow_peak, current - start + arrow_kept
+
+
+def _records_frame(inputs):
+    # How results were built before the columnar buffer: one dict per
+    # month, then a DataFrame from the list of dicts
+    import pandas as pd
+
+    from engine import RESULT_COLUMNS, simulate_months
+
+    out = simulate_months(**inputs)
+    labels = out.label_column()
+    rows = []
+    for t, month in enumerate(out.months):
+        row = {"Month": month}
+        for name in RESULT_COLUMNS[:5]:
+            row[name] = out.arrays[name][t]
+        row["Label"] = labels[t]
+        for name in RESULT_COLUMNS[5:]:
+            row[name] = out.arrays[name][t]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _records_chart_inputs(df):
+    # The chart inputs as they were derived before: filtered copies grouped
+    # with Python aggregations, and per-element lists for the surplus split
+    labels = [
+        df[df["Label"] != ""].groupby("Month").agg({"Label": " | ".join, column: "first"}).reset_index()
+        for column in ("Cash", "Monthly Surplus")
+    ]
+    surplus = [value if value >= 0 else None for value in df["Monthly Surplus"]]
+    deficit = [value if value < 0 else None for value in df["Monthly Surplus"]]
+    return labels, surplus, deficit
+
+
+def memory_cases(horizons=MEMORY_HORIZONS):
+    """``(name, records_fn, columnar_fn)`` for building results and chart inputs."""
+    from engine import run_simulation
+    from figures import event_points, surplus_split
+
+    for n_months in horizons:
+        inputs = dict(BASE_INPUTS, horizon_end=horizon_end(n_months))
+        df = run_simulation(**inputs)
+        yield (
+            f"engine.frame[{n_months}m]",
+            lambda inputs=inputs: _records_frame(inputs),
+            lambda inputs=inputs: run_simulation(**inputs),
+        )
+        yield (
+            f"figures.chart_inputs[{n_months}m]",
+            lambda df=df: _records_chart_inputs(df),
+            lambda df=df: (event_points(df, "Cash"), event_points(df, "Monthly Surplus"), surplus_split(df)),
+        )
+
+
+def check_memory(horizons=MEMORY_HORIZONS):
+    """Print peak and retained traced memory, records against columnar."""
+    print(f"{'case':<32} {'records peak':>13} {'columnar peak':>14} {'ratio':>6} {'records kept':>13} {'columnar kept':>14}")
+    for name, records, columnar in memory_cases(horizons):
+        records_peak, records_kept = traced_memory(records)
+        columnar_peak, columnar_kept = traced_memory(columnar)
+        print(
+            f"{name:<32} {records_peak / 1024:10.0f} KB {columnar_peak / 1024:11.0f} KB "
+            f"{records_peak / max(columnar_peak, 1):5.1f}x {records_kept / 1024:10.0f} KB {columnar_kept / 1024:11.0f} KB"
+        )
+
+
+def import_profile(module):
+    """Import ``module`` in a fresh interpreter under ``-X importtime``.
+
+    Returns ``(cumulative_us, children, loaded)``: the module's cumulative
+    import time, ``(name, cumulative_us)`` for each package it imports
+    directly, and the top-level names of everything the import loaded.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((match[4], int(match[2]), len(match[3]) // 2))
+    # Entries are listed as each import finishes, so the target's own
+    # imports are the ones since the previous top-level entry
+    end = max(k for k, (name, _, depth) in enumerate(entries) if name == module and depth == 0)
+    begin = max((k for k in range(end) if entries[k][2] == 0), default=-1) + 1
+    nested = entries[begin:end]
+    children = [(name, us) for name, us, depth in nested if depth == 1]
+    loaded = {name.split(".")[0] for name, _, _ in nested}
+    return entries[end][1], children, loaded
+
+
+def check_imports(modules, repeat=5, top=8):
+    """Print the import-time report for ``modules``; returns the budget and
+    forbidden-import violations. Times are the best of ``repeat`` runs."""
+    violations = []
+    for module in modules:
+        runs = [import_profile(module) for _ in range(repeat)]
+        total, children, loaded = min(runs, key=lambda run: run[0])
+        budget = IMPORT_BUDGETS.get(module)
+        print(f"{module:<16} {total / 1e3:8.1f} ms" + (f"  (budget {budget} ms)" if budget else ""))
+        for name, us in sorted(children, key=lambda child: -child[1])[:top]:
+            print(f"    {name:<28} {us / 1e3:8.1f} ms")
+        if budget is not None and total / 1e3 > budget:
+            violations.append(f"{module} imports in {total / 1e3:.1f} ms, over its {budget} ms budget")
+        for package in FORBIDDEN_IMPORTS.get(module, ()):
+            if package in loaded:
+                violations.append(f"{module} loads {package} at import time")
+    return violations
+
+
+def _ms(seconds):
+    return f"{seconds * 1e3:12.3f}" if seconds is not None else f"{'-':>12}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forward Flow benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run benchmarks and write JSON results")
+    run.add_argument("--suite", nargs="+", choices=list(SUITES), default=list(SUITES))
+    run.add_argument("--filter", help="only cases whose name contains this text")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--out", default=RESULTS_PATH)
+    run.add_argument("--save-baseline", action="store_true", help=f"also write {os.path.basename(BASELINE_PATH)}")
+    cmp = commands.add_parser("compare", help="flag regressions against the stored baseline")
+    cmp.add_argument("current", nargs="?", default=RESULTS_PATH)
+    cmp.add_argument("--baseline", default=BASELINE_PATH)
+    cmp.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown as a fraction (default 0.1)")
+    imports = commands.add_parser("imports", help="cold import times against their budgets")
+    imports.add_argument("--module", nargs="+", default=list(IMPORT_BUDGETS))
+    imports.add_argument("--repeat", type=int, default=5)
+    imports.add_argument("--top", type=int, default=8, help="direct imports listed per module")
+    memory = commands.add_parser("memory", help="peak memory of per-row records against columnar results")
+    memory.add_argument("--months", nargs="+", type=int, default=MEMORY_HORIZONS, help="horizon lengths")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_suites(args.suite, repeat=args.repeat, pattern=args.filter)
+        for path in [args.out] + ([BASELINE_PATH] if args.save_baseline else []):
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"wrote {path}")
+        return 0
+
+    if args.command == "imports":
+        violations = check_imports(args.module, repeat=args.repeat, top=args.top)
+        for violation in violations:
+            print(violation)
+        return 1 if violations else 0
+
+    if args.command == "memory":
+        check_memory(args.months)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+    print(f"{'case':<40} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}  status")
+    for name, before, after, ratio, status in rows:
+        print(f"{name:<40} {_ms(before)} {_ms(after)} {ratio if ratio is not None else float('nan'):7.2f}  {status}")
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    missing = [row[0] for row in rows if row[4] == "missing"]
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}")
+    if missing:
+        print(
+            f"{len(missing)} baseline case(s) not measured: {', '.join(missing)}; "
+            "if they were renamed or dropped, regenerate the baseline with run --save-baseline"
+        )
+    return 1 if regressions or missing else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT)
+    sys.exit(main())
@@ -0,0 +1,259 @@
+# Result cache and precomputed input lattice shared by every dashboard session
+from collections import OrderedDict
+from concurrent.futures import Future
+import hashlib
+import itertools
+import json
+import os
+import threading
+
+import numpy as np
+
+from engine import RESULT_COLUMNS, batch_frame, run_simulation, run_simulation_batch
+
+# Changes whenever engine.py changes, so persisted results never outlive the
+# code that produced them
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine.py"), "rb") as _f:
+    ENGINE_FINGERPRINT = hashlib.sha256(_f.read()).hexdigest()[:16]
+
+LATTICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"cannot hash {type(value).__name__}")
+
+
+def content_key(kind, inputs):
+    """Stable content hash of a computation kind and its inputs."""
+    payload = json.dumps(
+        {"kind": kind, "engine": ENGINE_FINGERPRINT, "inputs": inputs},
+        sort_keys=True,
+        default=_json_default,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def result_nbytes(result):
+    """Approximate memory held by a DataFrame or a dict of arrays."""
+    if hasattr(result, "memory_usage"):
+        return int(result.memory_usage(deep=True).sum())
+    if isinstance(result, dict):
+        return sum(result_nbytes(v) for v in result.values())
+    if hasattr(result, "nbytes"):
+        # Arrays and array-backed objects such as ResultLattice
+        return int(result.nbytes)
+    return 64
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by entry count and total bytes.
+
+    Values are shared between sessions and must be treated as read-only.
+    Concurrent misses on one key are coalesced: the first caller computes
+    the value and the others wait for it instead of repeating the work.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lattice_hits = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = result_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def record_lattice_hit(self):
+        with self._lock:
+            self.lattice_hits += 1
+
+    def compute_once(self, key, compute):
+        """The cached value for ``key``, or ``compute()`` cached under it.
+
+        If another thread is already computing ``key`` this waits for its
+        result (or exception) rather than computing it again.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = Future()
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+        if not owner:
+            return pending.result()
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(exc)
+            raise
+        self.put(key, value)
+        with self._lock:
+            del self._pending[key]
+        pending.set_result(value)
+        return value
+
+    def get_or_compute(self, kind, inputs, compute):
+        return self.compute_once(content_key(kind, inputs), compute)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "lattice_hits": self.lattice_hits,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "computing": len(self._pending),
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class ResultLattice:
+    """Every combination of a few discrete inputs, simulated in one batch.
+
+    ``fixed`` holds the remaining ``run_simulation`` keyword arguments and
+    ``axes`` maps each discrete argument to its list of values. Results are
+    stored column by column as ``(scenarios, months)`` arrays in C order of
+    the axes, so a lookup is an index computation rather than a simulation.
+    """
+
+    def __init__(self, fixed, axes, columns):
+        self.fixed = dict(fixed)
+        self.axes = {name: list(values) for name, values in axes.items()}
+        self.columns = columns
+        self._shape = tuple(len(values) for values in self.axes.values())
+
+    @classmethod
+    def build(cls, fixed, axes):
+        names = list(axes)
+        grid = list(itertools.product(*(axes[name] for name in names)))
+        inputs = dict(fixed)
+        for k, name in enumerate(names):
+            inputs[name] = np.array([combo[k] for combo in grid])
+        result = run_simulation_batch(**inputs)
+        columns = {name: np.ascontiguousarray(result[name]) for name in RESULT_COLUMNS}
+        columns["Month"] = result["Month"]
+        columns["CRA Paid Off"] = result["CRA Paid Off"].astype(np.int16)
+        columns["HELOC Paid Off"] = result["HELOC Paid Off"].astype(np.int16)
+        return cls(fixed, axes, columns)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def index(self, inputs):
+        """Flat scenario index for ``inputs``, or None if they are off-lattice."""
+        if set(inputs) - set(self.fixed) - set(self.axes):
+            return None
+        for name, value in self.fixed.items():
+            if inputs.get(name, value) != value:
+                return None
+        position = []
+        for name, values in self.axes.items():
+            value = inputs.get(name)
+            for j, candidate in enumerate(values):
+                if candidate == value or (
+                    isinstance(candidate, float) and isinstance(value, float) and abs(candidate - value) < 1e-9
+                ):
+                    position.append(j)
+                    break
+            else:
+                return None
+        return int(np.ravel_multi_index(position, self._shape))
+
+    def frame(self, inputs):
+        i = self.index(inputs)
+        if i is None:
+            return None
+        return batch_frame(
+            self.columns,
+            i,
+            inputs["jessica_start_month"],
+            inputs.get("loan_repay_month", self.fixed.get("loan_repay_month", "2026-12")),
+            self.fixed.get("schedule"),
+            self.fixed.get("expense_path"),
+        )
+
+    def save(self, path):
+        meta = json.dumps({"fixed": self.fixed, "axes": self.axes}, default=_json_default)
+        np.savez_compressed(path, _meta=np.array(meta), **self.columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["_meta"]))
+            columns = {name: data[name] for name in data.files if name != "_meta"}
+        return cls(meta["fixed"], meta["axes"], columns)
+
+
+def load_or_build_lattice(fixed, axes, directory=LATTICE_DIR):
+    """Load the lattice for ``fixed``/``axes`` from disk, building it if absent."""
+    key = content_key("lattice", {"fixed": fixed, "axes": axes})
+    path = os.path.join(directory, f"lattice-{key[:20]}.npz")
+    if os.path.exists(path):
+        return ResultLattice.load(path)
+    lattice = ResultLattice.build(fixed, axes)
+    os.makedirs(directory, exist_ok=True)
+    lattice.save(path)
+    return lattice
+
+
+def cached_simulation(cache, inputs, lattice=None, simulate=run_simulation):
+    """``simulate(**inputs)`` served from ``cache`` or ``lattice`` when possible.
+
+    ``simulate`` defaults to ``run_simulation``; pass a session's
+    ``IncrementalSimulation.run`` to replay only the affected months on a miss.
+    """
+
+    def compute():
+        df = lattice.frame(inputs) if lattice is not None else None
+        if df is not None:
+            cache.record_lattice_hit()
+            return df
+        return simulate(**inputs)
+
+    return cache.compute_once(content_key("simulation", inputs), compute)
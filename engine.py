@@ -0,0 +1,940 @@
+# Cash-flow simulation engine for the dashboard
+#
+# Importing this module only loads the standard library: the month-by-month
+# path (simulate_months, compile_schedule) is pure Python writing into
+# ``array.array`` columns, NumPy is imported by the batch functions and the
+# array views, and pandas only where a DataFrame is returned, so batch
+# workers and command-line tools start without the UI stack.
+from array import array
+import calendar
+import functools
+import itertools
+import json
+import numbers
+
+# Simulation horizon (inclusive, month starts)
+HORIZON_START = "2024-06"
+HORIZON_END = "2027-01"
+
+# Interest accrual conventions. "monthly" charges rate / 12 on each month's
+# balance; "daily" accrues over the month's actual days on an actual/365
+# basis, compounding CRA interest daily and charging HELOC interest as
+# simple daily interest billed monthly.
+ACCRUAL_MODES = ("monthly", "daily")
+DAY_COUNT_BASIS = 365
+
+# Opening balances
+CRA_START = 170000  # Assuming initial CRA balance, as it was missing
+HELOC_START = 330000
+
+# Rates and recurring flows
+CRA_RATE = 0.0938
+HELOC_RATE = 0.0545
+EXPENSES = 18700
+RENTAL_INCOME = 3400
+COTTAGE_MORTGAGE = 1700
+FTC_BENEFIT = 1200  # FTC benefit begins in 2026
+FTC_YEAR = 2026
+
+# One-off events
+BONUS_MONTH = "2025-07"
+REFUND_MONTH = "2025-10"
+COTTAGE_MONTH = "2025-10"
+CAPITAL_GAINS_MONTH = "2025-11"
+FTC_START_MONTH = "2026-01"
+CONFIRMED_BONUS = 50000
+LOAN_AMOUNT = 50000
+REFUND = 28046
+COTTAGE_DEDUCTION = 285000  # 245K mortgage + 40K tax estimate
+CAPITAL_GAINS_TAX = 12000
+
+# The household's event calendar. Each event has a ``kind``, a "YYYY-MM"
+# ``month`` and, depending on the kind, an ``amount``:
+#   bonus           paid to CRA then HELOC; the milestone total joins the first one
+#   loan            cash in, held in reserve until ``loan_repay_month``
+#   refund          paid to CRA, remainder to HELOC
+#   cottage_sale    sale price less ``deduction`` to CRA, HELOC, then cash
+#   tax_bill        cash out
+#   expense_change  permanent change to monthly expenses from ``month`` on
+#   cash            added to the month's net flow; repeats every ``every``
+#                   months up to ``until`` when those are set
+# An optional ``label`` annotates the event's (first) month on the charts.
+DEFAULT_SCHEDULE = [
+    {"kind": "bonus", "month": BONUS_MONTH, "amount": CONFIRMED_BONUS, "label": "Jack Receives Bonus"},
+    {"kind": "loan", "month": BONUS_MONTH, "amount": LOAN_AMOUNT},
+    {"kind": "refund", "month": REFUND_MONTH, "amount": REFUND, "label": "ABIL Tax Refund"},
+    {"kind": "cottage_sale", "month": COTTAGE_MONTH, "deduction": COTTAGE_DEDUCTION, "label": "Cottage Sale"},
+    # Cottage mortgage stops and the $12K tax bill lands the month after the sale
+    {"kind": "expense_change", "month": CAPITAL_GAINS_MONTH, "amount": -COTTAGE_MORTGAGE},
+    {"kind": "tax_bill", "month": CAPITAL_GAINS_MONTH, "amount": CAPITAL_GAINS_TAX, "label": "Capital Gains Tax Paid"},
+    {
+        "kind": "cash",
+        "month": FTC_START_MONTH,
+        "every": 1,
+        "until": f"{FTC_YEAR}-12",
+        "amount": FTC_BENEFIT,
+        "label": "FTC Relief Begins",
+    },
+]
+
+EVENT_KINDS = ["bonus", "loan", "refund", "cottage_sale", "tax_bill", "expense_change", "cash"]
+# Kinds whose events need an ``amount`` (a cottage sale's proceeds come from
+# the sale price input instead)
+AMOUNT_KINDS = ["bonus", "loan", "refund", "tax_bill", "expense_change", "cash"]
+
+# Numeric result columns shared by the scalar and batch engines
+RESULT_COLUMNS = [
+    "Cash",
+    "CRA Balance",
+    "HELOC Balance",
+    "CRA Interest",
+    "HELOC Interest",
+    "Monthly Surplus",
+    "Monthly Income",
+    "Monthly Expenses",
+]
+
+
+class ResultBuffer:
+    """Columnar result of a scalar simulation run, filled in place.
+
+    Each of ``RESULT_COLUMNS`` is a typed ``array.array`` preallocated for
+    the whole horizon ("Monthly Expenses" holds integers when every expense
+    is one), month annotations are a sparse ``{month index: label}`` dict
+    and the payoff months are indices (-1 if never). ``column`` views a
+    column as a read-only NumPy array over the same memory, and
+    ``to_pandas`` / ``to_arrow`` are built from those views, so no per-row
+    objects are created and the numeric columns are never copied.
+    """
+
+    def __init__(self, months, integer_expenses=False):
+        self.months = months
+        self.arrays = {
+            name: array("q", [0]) * len(months) if integer_expenses and name == "Monthly Expenses"
+            else array("d", [0.0]) * len(months)
+            for name in RESULT_COLUMNS
+        }
+        self.labels = {}
+        self.cra_paid_off = -1
+        self.heloc_paid_off = -1
+
+    def __len__(self):
+        return len(self.months)
+
+    @property
+    def nbytes(self):
+        return sum(len(column) * column.itemsize for column in self.arrays.values())
+
+    def copy_head(self, other, stop):
+        """Take the months before ``stop`` from ``other``, a buffer over the same horizon."""
+        for name, column in self.arrays.items():
+            head = other.arrays[name][:stop]
+            if head.typecode != column.typecode:
+                head = array(column.typecode, map(float if column.typecode == "d" else int, head))
+            column[:stop] = head
+        self.labels = {t: label for t, label in other.labels.items() if t < stop}
+        self.cra_paid_off = other.cra_paid_off if other.cra_paid_off < stop else -1
+        self.heloc_paid_off = other.heloc_paid_off if other.heloc_paid_off < stop else -1
+
+    def state(self, t):
+        """The ``(cash, cra_bal, heloc_bal, cra_paid_off, heloc_paid_off)``
+        state carried over after month ``t``."""
+        return (
+            self.arrays["Cash"][t],
+            self.arrays["CRA Balance"][t],
+            self.arrays["HELOC Balance"][t],
+            0 <= self.cra_paid_off <= t,
+            0 <= self.heloc_paid_off <= t,
+        )
+
+    def column(self, name):
+        """Column ``name`` as a read-only NumPy array sharing the buffer's memory."""
+        import numpy as np
+
+        values = self.arrays[name]
+        view = np.frombuffer(values, dtype=values.typecode)
+        view.flags.writeable = False
+        return view
+
+    def label_column(self):
+        """The dense ``Label`` column: the label per month, "" where there is none."""
+        out = [""] * len(self.months)
+        for t, label in self.labels.items():
+            out[t] = label
+        return out
+
+    def _columns(self, text):
+        # Frame columns in ``run_simulation`` order, the text ones from ``text``
+        columns = {"Month": text(self.months)}
+        for name in RESULT_COLUMNS[:5]:
+            columns[name] = self.column(name)
+        columns["Label"] = text(self.label_column())
+        for name in RESULT_COLUMNS[5:]:
+            columns[name] = self.column(name)
+        return columns
+
+    def to_pandas(self):
+        """The ``run_simulation`` DataFrame, its numeric columns backed by this buffer.
+
+        The text columns are built as Arrow strings and wrapped, which
+        avoids pandas' per-element inference over Python lists.
+        """
+        import pandas as pd
+        import pyarrow as pa
+
+        def text(values):
+            return pd.array(pa.array(values, pa.string()), dtype="str")
+
+        return pd.DataFrame(self._columns(text), copy=False)
+
+    def to_arrow(self):
+        """The same table as ``to_pandas`` as a ``pyarrow.Table``, numeric columns zero-copy."""
+        import pyarrow as pa
+
+        columns = self._columns(lambda values: pa.array(values, pa.string()))
+        return pa.table({name: pa.array(values) for name, values in columns.items()})
+
+
+def run_simulation(
+    jack_income_usd,
+    fx_rate,
+    jessica_income_cad,
+    jessica_start_month,
+    bonus_milestone_total,
+    start_savings,
+    cottage_sale_price,
+    loan_repay_month="2026-12",
+    schedule=None,
+    horizon_end=HORIZON_END,
+    accrual="monthly",
+    expense_path=None,
+):
+    return simulate_months(
+        jack_income_usd,
+        fx_rate,
+        jessica_income_cad,
+        jessica_start_month,
+        bonus_milestone_total,
+        start_savings,
+        cottage_sale_price,
+        loan_repay_month,
+        schedule,
+        horizon_end=horizon_end,
+        accrual=accrual,
+        expense_path=expense_path,
+    ).to_pandas()
+
+
+def simulate_months(
+    jack_income_usd,
+    fx_rate,
+    jessica_income_cad,
+    jessica_start_month,
+    bonus_milestone_total,
+    start_savings,
+    cottage_sale_price,
+    loan_repay_month="2026-12",
+    schedule=None,
+    start=0,
+    previous=None,
+    horizon_end=HORIZON_END,
+    accrual="monthly",
+    expense_path=None,
+):
+    """Scalar monthly loop behind ``run_simulation``, returning a ``ResultBuffer``.
+
+    Runs from month index ``start``; the months before it, and the state
+    carried over from them, are taken from ``previous``, the buffer of an
+    earlier run over the same horizon. Since every month's state is in
+    the buffer, a later run can resume from any month.
+    ``horizon_end`` ("YYYY-MM") is the last simulated month and ``accrual``
+    one of ``ACCRUAL_MODES``. ``expense_path``, one amount per horizon month
+    (e.g. from imported transactions), replaces the constant expenses and
+    the scheduled expense changes.
+    """
+    events = compile_schedule(schedule, end=horizon_end)
+    months = events["months"]
+    cra_rates = monthly_rates(CRA_RATE, months, accrual, compound=True)
+    heloc_rates = monthly_rates(HELOC_RATE, months, accrual, compound=False)
+    expenses = events["expenses"] if expense_path is None else list(expense_path)
+    if len(expenses) != len(months):
+        raise ValueError(f"expense_path has {len(expenses)} months, expected {len(months)}")
+    repay_idx = month_index(loan_repay_month)
+    static_labels = input_labels(events, jessica_start_month, loan_repay_month)
+
+    out = ResultBuffer(months, integer_expenses=_integer_expenses(expenses))
+    if start > 0:
+        out.copy_head(previous, start)
+        state = previous.state(start - 1)
+    else:
+        state = (start_savings, CRA_START, HELOC_START, False, False)
+    cash, cra_bal, heloc_bal, cra_paid_off, heloc_paid_off = state
+    (
+        cash_col, cra_col, heloc_col, cra_int_col, heloc_int_col, surplus_col, income_col, expenses_col
+    ) = (out.arrays[name] for name in RESULT_COLUMNS)
+
+    jack_income_cad = jack_income_usd * fx_rate
+
+    for t in range(start, len(months)):
+        m_str = months[t]
+        j_income = jessica_income_cad if m_str >= jessica_start_month else 0
+        inflow = jack_income_cad + j_income + RENTAL_INCOME  # includes rental income
+        monthly_expenses = expenses[t]
+        net = inflow - monthly_expenses
+        if events["cash"][t]:
+            net += events["cash"][t]
+
+        # Apply bonus (confirmed + future milestone bonuses) to CRA first
+        if events["bonus"][t] or t == events["bonus_month"]:
+            bonus_amount = events["bonus"][t]
+            if t == events["bonus_month"]:
+                bonus_amount += bonus_milestone_total
+            if cra_bal > 0:
+                applied = min(bonus_amount, cra_bal)
+                cra_bal -= applied
+                bonus_amount -= applied
+            if bonus_amount > 0 and heloc_bal > 0:
+                applied = min(bonus_amount, heloc_bal)
+                heloc_bal -= applied
+
+        # Add loan amount directly to cash
+        if events["loan"][t]:
+            cash += events["loan"][t]
+
+        # Apply refund to CRA first
+        if events["refund"][t]:
+            refund = events["refund"][t]
+            if cra_bal > 0:
+                applied = min(refund, cra_bal)
+                cra_bal -= applied
+                remainder = refund - applied
+                heloc_bal -= remainder
+            else:
+                heloc_bal -= refund
+
+        # Apply cottage proceeds to CRA first
+        if events["sales"][t]:
+            net_cottage_proceeds = cottage_sale_price * events["sales"][t] - events["sale_deduction"][t]
+            if cra_bal > 0:
+                applied = min(net_cottage_proceeds, cra_bal)
+                cra_bal -= applied
+                remainder = net_cottage_proceeds - applied
+                if heloc_bal > 0:
+                    applied_heloc = min(remainder, heloc_bal)
+                    heloc_bal -= applied_heloc
+                    cash += remainder - applied_heloc
+                else:
+                    cash += remainder
+            else:
+                if heloc_bal > 0:
+                    applied_heloc = min(net_cottage_proceeds, heloc_bal)
+                    heloc_bal -= applied_heloc
+                    cash += net_cottage_proceeds - applied_heloc
+                else:
+                    cash += net_cottage_proceeds
+
+        if events["tax_bill"][t]:
+            cash -= events["tax_bill"][t]
+
+        # Interest accrual
+        heloc_int = heloc_bal * heloc_rates[t] / 12
+
+        # Add income, subtract interest, then apply surplus to debt
+        cash += net
+
+        reserved_for_loan = events["loan_drawn"][t] if t < repay_idx else 0
+        available_cash = max(cash - reserved_for_loan, 0)
+
+        # CRA interest accrues regardless of ability to pay
+        cra_int = max(0, cra_bal * cra_rates[t] / 12)
+
+        # Subtract interest from available_cash if affordable
+        if available_cash >= cra_int:
+            available_cash -= cra_int
+        else:
+            available_cash = 0  # Interest is still owed but cash is gone
+            available_cash -= heloc_int
+        if available_cash < 0:
+            heloc_int += available_cash
+            available_cash = 0
+
+        # Apply remaining available_cash to CRA first, then HELOC
+        if available_cash > 0:
+            if cra_bal > 0:
+                applied = min(available_cash, cra_bal)
+                cra_bal -= applied
+                available_cash -= applied
+            if heloc_bal > 0 and available_cash > 0:
+                applied = min(available_cash, heloc_bal)
+                heloc_bal -= applied
+                available_cash -= applied
+
+        # Update cash to reflect payments made from available_cash; the
+        # reserve is released (not paid out) in the repayment month
+        cash = reserved_for_loan + available_cash
+
+        # Annotations, built only for months that have any
+        labels = static_labels.get(t)
+        if not cra_paid_off and cra_bal <= 0:
+            labels = (labels or []) + ["CRA Debt Paid Off"]
+            cra_paid_off = True
+            out.cra_paid_off = t
+        if not heloc_paid_off and heloc_bal <= 0:
+            labels = (labels or []) + ["HELOC Paid Off"]
+            heloc_paid_off = True
+            out.heloc_paid_off = t
+        if labels:
+            out.labels[t] = " | ".join(sorted(set(labels)))
+
+        cash_col[t] = cash
+        cra_col[t] = cra_bal
+        heloc_col[t] = heloc_bal
+        cra_int_col[t] = cra_int
+        heloc_int_col[t] = heloc_int
+        surplus_col[t] = net - cra_int - heloc_int
+        income_col[t] = inflow
+        expenses_col[t] = monthly_expenses
+
+    return out
+
+
+def month_range(start, end):
+    """Return the "YYYY-MM" labels from ``start`` to ``end`` inclusive."""
+    year, month = map(int, start.split("-"))
+    end_year, end_month = map(int, end.split("-"))
+    labels = []
+    while (year, month) <= (end_year, end_month):
+        labels.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return labels
+
+
+def month_index(month, origin=HORIZON_START):
+    """Months elapsed from ``origin`` to a "YYYY-MM" label (may be negative)."""
+    year, mon = map(int, month.split("-"))
+    origin_year, origin_month = map(int, origin.split("-"))
+    return (year - origin_year) * 12 + (mon - origin_month)
+
+
+def month_days(months):
+    """Calendar days in each "YYYY-MM" month of ``months``."""
+    return [calendar.monthrange(*map(int, month.split("-")))[1] for month in months]
+
+
+def accrual_rate(rate, days, compound):
+    """Annual rate whose monthly charge ``balance * rate / 12`` equals the
+    interest a balance accrues over ``days`` days at ``rate`` (actual/365).
+
+    With ``compound`` the interest compounds daily, ``(1 + rate / 365) ** days
+    - 1``; otherwise it is simple daily interest, ``rate * days / 365``.
+    Works elementwise on NumPy arrays.
+    """
+    if compound:
+        return ((1 + rate / DAY_COUNT_BASIS) ** days - 1) * 12
+    return rate * days / DAY_COUNT_BASIS * 12
+
+
+def monthly_rates(rate, months, accrual="monthly", compound=False):
+    """Per-month rates ``r_t`` for the ``balance * r_t / 12`` interest charge.
+
+    Monthly accrual charges ``rate`` itself every month; daily accrual uses
+    ``accrual_rate`` over each month's calendar days, so the balance held
+    between the month's cash events accrues exactly, in closed form.
+    """
+    if accrual not in ACCRUAL_MODES:
+        raise ValueError(f"accrual must be one of {ACCRUAL_MODES}")
+    if accrual == "monthly":
+        return [rate] * len(months)
+    return [accrual_rate(rate, days, compound) for days in month_days(months)]
+
+
+def _month_indices(months):
+    import numpy as np
+
+    months = np.asarray(months)
+    if months.dtype.kind in "iu":
+        return months.astype(np.int64)
+    labels, inverse = np.unique(months, return_inverse=True)
+    indices = np.array([month_index(str(m)) for m in labels], dtype=np.int64)
+    return indices[inverse].reshape(months.shape)
+
+
+def compile_schedule(schedule=None, start=HORIZON_START, end=HORIZON_END):
+    """Compile an event schedule into per-month tables for the horizon.
+
+    The events are grouped by kind into parallel month-index / amount arrays
+    and scattered onto dense per-month amount lists in one pass, so the
+    monthly loop does a constant amount of work per month however many
+    events there are. Labels are kept sparse, keyed by month index.
+    ``schedule`` defaults to ``DEFAULT_SCHEDULE``.
+
+    Compiled tables are cached per schedule and horizon and shared between
+    callers, so they must be treated as read-only.
+    """
+    schedule = DEFAULT_SCHEDULE if schedule is None else schedule
+    try:
+        key = json.dumps(schedule, sort_keys=True)
+    except TypeError:
+        # Values JSON cannot represent (e.g. NumPy integers): compile uncached
+        return _compile_schedule(schedule, start, end)
+    return _compiled_schedule(key, start, end)
+
+
+@functools.lru_cache(maxsize=32)
+def _compiled_schedule(key, start, end):
+    return _compile_schedule(json.loads(key), start, end)
+
+
+def _is_month(value):
+    parts = value.split("-") if isinstance(value, str) else []
+    return len(parts) == 2 and all(part.isdigit() for part in parts) and 1 <= int(parts[1]) <= 12
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def check_event(event):
+    """Raise ``ValueError`` saying what a schedule event is missing or has malformed."""
+    kind = event.get("kind")
+    if kind not in EVENT_KINDS:
+        raise ValueError(f"unknown event kind {kind!r}")
+    if "month" not in event:
+        raise ValueError(f"{kind} event needs a month")
+    for field in ("month", "until"):
+        if field in event and not _is_month(event[field]):
+            raise ValueError(f"{kind} event {field} {event[field]!r} is not a YYYY-MM month")
+    if kind in AMOUNT_KINDS and not _is_number(event.get("amount")):
+        raise ValueError(f"{kind} event needs a numeric amount")
+    for field in ("amount", "deduction"):
+        if field in event and not _is_number(event[field]):
+            raise ValueError(f"{kind} event {field} {event[field]!r} is not a number")
+    every = event.get("every")
+    if every is not None and not (_is_number(every) and every >= 1 and float(every).is_integer()):
+        raise ValueError(f"{kind} event repeats every {every!r} months; expected a whole number of at least 1")
+
+
+def _compile_schedule(schedule, start, end):
+    months = month_range(start, end)
+    n_months = len(months)
+
+    index = {kind: [] for kind in EVENT_KINDS}
+    amount = {kind: [] for kind in EVENT_KINDS}
+    deduction = []
+    labels = {}
+    for k, event in enumerate(schedule):
+        try:
+            check_event(event)
+        except ValueError as exc:
+            raise ValueError(f"schedule event {k + 1}: {exc}") from None
+        kind = event["kind"]
+        first = month_index(event["month"], start)
+        if kind == "cash" and event.get("every"):
+            last = month_index(event["until"], start) if event.get("until") else n_months - 1
+            occurrences = range(first, min(last, n_months - 1) + 1, int(event["every"]))
+        else:
+            occurrences = [first]
+        for t in occurrences:
+            if 0 <= t < n_months:
+                index[kind].append(t)
+                amount[kind].append(event.get("amount", 0))
+                if kind == "cottage_sale":
+                    deduction.append(event.get("deduction", 0))
+        if event.get("label") and 0 <= first < n_months:
+            labels.setdefault(first, []).append(event["label"])
+
+    def dense(kind, values=None):
+        values = amount[kind] if values is None else values
+        out = [0] * n_months
+        for t, value in zip(index[kind], values):
+            out[t] += value
+        # Whole-number amounts stay int, anything else makes the table float
+        cast = float if any(isinstance(value, float) for value in values) else int
+        return [cast(value) for value in out]
+
+    expense_changes = list(itertools.accumulate(dense("expense_change")))
+    compiled = {
+        "months": months,
+        "labels": labels,
+        "expenses": [EXPENSES + change for change in expense_changes],
+        "expense_changes": expense_changes,
+        "cash": dense("cash"),
+        "bonus": dense("bonus"),
+        "loan": dense("loan"),
+        "loan_drawn": list(itertools.accumulate(dense("loan"))),
+        "refund": dense("refund"),
+        "sales": dense("cottage_sale", [1] * len(index["cottage_sale"])),
+        "sale_deduction": dense("cottage_sale", deduction),
+        "tax_bill": dense("tax_bill"),
+        "bonus_month": min(index["bonus"], default=None),
+        "sale_month": min(index["cottage_sale"], default=None),
+    }
+    return compiled
+
+
+def input_labels(events, jessica_start_month, loan_repay_month="2026-12"):
+    """Sparse ``{month index: [labels]}`` for a compiled schedule plus the
+    input-driven events (Jessica's start month and the loan repayment)."""
+    labels = {t: list(names) for t, names in events["labels"].items()}
+    for month, name in ((jessica_start_month, "Jessica Returns to Work"), (loan_repay_month, "Loan Repayment")):
+        if month in events["months"]:
+            labels.setdefault(events["months"].index(month), []).append(name)
+    return labels
+
+
+def _integer_expenses(expenses):
+    # Results hold "Monthly Expenses" as integers when every expense is one
+    return not any(isinstance(x, float) for x in expenses)
+
+
+def _batch_param(x, dtype, n_months):
+    import numpy as np
+
+    arr = np.asarray(x, dtype=dtype)
+    if arr.ndim == 2 and arr.shape[1] != n_months:
+        raise ValueError(f"per-month input has {arr.shape[1]} columns, expected {n_months}")
+    if arr.ndim > 2:
+        raise ValueError("batch inputs must be scalars, (n,) or (n, months) arrays")
+    return np.atleast_1d(arr)
+
+
+def _at(x, t):
+    # Month ``t`` of a per-month path, or the value itself for fixed inputs
+    return x[:, t] if x.ndim == 2 else x
+
+
+def run_simulation_batch(
+    jack_income_usd,
+    fx_rate,
+    jessica_income_cad,
+    jessica_start_month,
+    bonus_milestone_total,
+    start_savings,
+    cottage_sale_price,
+    loan_repay_month="2026-12",
+    cra_rate=CRA_RATE,
+    heloc_rate=HELOC_RATE,
+    schedule=None,
+    base_expenses=EXPENSES,
+    rental_income=RENTAL_INCOME,
+    cash_event_scale=1.0,
+    sale_deduction_scale=1.0,
+    horizon_end=HORIZON_END,
+    accrual="monthly",
+    expense_path=None,
+):
+    """Vectorised ``run_simulation`` over many scenarios at once.
+
+    Every argument is a scalar or a 1-D array; they are broadcast against each
+    other to ``n`` scenarios. Month arguments are "YYYY-MM" strings or integer
+    month indices from ``HORIZON_START``. All scenarios are stepped together one
+    month at a time, following the scalar rules operation for operation so the
+    numbers match ``run_simulation`` exactly.
+
+    The incomes, ``fx_rate`` and the two interest rates may also be
+    ``(n, months)`` arrays giving a separate value for every month, which is
+    how the Monte Carlo mode feeds in stochastic paths.
+
+    The remaining arguments override constants of the scalar model per
+    scenario: the base monthly expenses (scheduled expense changes apply on
+    top), the rental income, and multipliers on the scheduled cash events
+    (the FTC benefit by default) and on the cottage sale deduction.
+    ``horizon_end`` ("YYYY-MM") is the last simulated month and ``accrual``
+    one of ``ACCRUAL_MODES``; daily accrual turns the rates into per-month
+    ``(n, months)`` rates for the calendar, computed in one vectorised pass.
+    ``expense_path`` gives the total monthly expenses per month, shared
+    ``(months,)`` or per scenario ``(n, months)``, in place of
+    ``base_expenses`` and the scheduled expense changes.
+
+    Returns a dict with ``"Month"`` (the month labels), one ``(n, months)``
+    array per entry of ``RESULT_COLUMNS``, and ``"CRA Paid Off"`` /
+    ``"HELOC Paid Off"`` holding the first paid-off month index per scenario
+    (-1 if never).
+    """
+    import numpy as np
+
+    events = compile_schedule(schedule, end=horizon_end)
+    months = events["months"]
+    n_months = len(months)
+
+    jack_income_usd = _batch_param(jack_income_usd, float, n_months)
+    fx_rate = _batch_param(fx_rate, float, n_months)
+    jessica_income_cad = _batch_param(jessica_income_cad, float, n_months)
+    jessica_start = np.atleast_1d(_month_indices(jessica_start_month))
+    bonus_milestone_total = _batch_param(bonus_milestone_total, float, n_months)
+    start_savings = _batch_param(start_savings, float, n_months)
+    cottage_sale_price = _batch_param(cottage_sale_price, float, n_months)
+    loan_repay = np.atleast_1d(_month_indices(loan_repay_month))
+    cra_rate = _batch_param(cra_rate, float, n_months)
+    heloc_rate = _batch_param(heloc_rate, float, n_months)
+    if accrual not in ACCRUAL_MODES:
+        raise ValueError(f"accrual must be one of {ACCRUAL_MODES}")
+    if accrual == "daily":
+        days = np.array(month_days(months), dtype=float)
+        cra_rate = accrual_rate(cra_rate if cra_rate.ndim == 2 else cra_rate[:, None], days, compound=True)
+        heloc_rate = accrual_rate(heloc_rate if heloc_rate.ndim == 2 else heloc_rate[:, None], days, compound=False)
+    base_expenses = _batch_param(base_expenses, float, n_months)
+    if expense_path is not None:
+        expense_path = _batch_param(np.atleast_2d(np.asarray(expense_path, dtype=float)), float, n_months)
+    rental_income = _batch_param(rental_income, float, n_months)
+    cash_event_scale = _batch_param(cash_event_scale, float, n_months)
+    sale_deduction_scale = _batch_param(sale_deduction_scale, float, n_months)
+    for name, arr in (
+        ("jessica_start_month", jessica_start),
+        ("bonus_milestone_total", bonus_milestone_total),
+        ("start_savings", start_savings),
+        ("cottage_sale_price", cottage_sale_price),
+        ("loan_repay_month", loan_repay),
+        ("base_expenses", base_expenses),
+        ("rental_income", rental_income),
+        ("cash_event_scale", cash_event_scale),
+        ("sale_deduction_scale", sale_deduction_scale),
+    ):
+        if arr.ndim != 1:
+            raise ValueError(f"{name} must be a scalar or a 1-D array")
+    (n,) = np.broadcast_shapes(
+        *(
+            arr.shape[:1]
+            for arr in (
+                jack_income_usd,
+                fx_rate,
+                jessica_income_cad,
+                jessica_start,
+                bonus_milestone_total,
+                start_savings,
+                cottage_sale_price,
+                loan_repay,
+                cra_rate,
+                heloc_rate,
+                base_expenses,
+                *([] if expense_path is None else [expense_path]),
+                rental_income,
+                cash_event_scale,
+                sale_deduction_scale,
+            )
+        )
+    )
+
+    # Filled month-major so each step writes contiguous rows
+    out = {name: np.empty((n_months, n)) for name in RESULT_COLUMNS}
+    cra_paid = np.full(n, -1, dtype=np.int64)
+    heloc_paid = np.full(n, -1, dtype=np.int64)
+
+    cash = np.broadcast_to(start_savings, (n,)).astype(float)
+    cra_bal = np.full(n, float(CRA_START))
+    heloc_bal = np.full(n, float(HELOC_START))
+
+    for t in range(n_months):
+        jack_income_cad = _at(jack_income_usd, t) * _at(fx_rate, t)
+        j_income = np.where(t >= jessica_start, _at(jessica_income_cad, t), 0.0)
+        inflow = jack_income_cad + j_income + rental_income
+        if expense_path is None:
+            monthly_expenses = base_expenses + events["expense_changes"][t]
+        else:
+            monthly_expenses = _at(expense_path, t)
+        net = inflow - monthly_expenses
+        if events["cash"][t]:
+            net = net + events["cash"][t] * cash_event_scale
+
+        if events["bonus"][t] or t == events["bonus_month"]:
+            bonus_amount = events["bonus"][t]
+            if t == events["bonus_month"]:
+                bonus_amount = bonus_amount + bonus_milestone_total
+            applied = np.where(cra_bal > 0, np.minimum(bonus_amount, cra_bal), 0.0)
+            cra_bal = cra_bal - applied
+            bonus_amount = bonus_amount - applied
+            applied = np.where((bonus_amount > 0) & (heloc_bal > 0), np.minimum(bonus_amount, heloc_bal), 0.0)
+            heloc_bal = heloc_bal - applied
+
+        if events["loan"][t]:
+            cash = cash + events["loan"][t]
+
+        if events["refund"][t]:
+            refund = events["refund"][t]
+            applied = np.where(cra_bal > 0, np.minimum(refund, cra_bal), 0.0)
+            cra_bal = cra_bal - applied
+            heloc_bal = heloc_bal - (refund - applied)
+
+        if events["sales"][t]:
+            proceeds = cottage_sale_price * events["sales"][t] - events["sale_deduction"][t] * sale_deduction_scale
+            applied = np.where(cra_bal > 0, np.minimum(proceeds, cra_bal), 0.0)
+            cra_bal = cra_bal - applied
+            remainder = proceeds - applied
+            applied_heloc = np.where(heloc_bal > 0, np.minimum(remainder, heloc_bal), 0.0)
+            heloc_bal = heloc_bal - applied_heloc
+            cash = cash + (remainder - applied_heloc)
+
+        if events["tax_bill"][t]:
+            cash = cash - events["tax_bill"][t]
+
+        heloc_int = heloc_bal * _at(heloc_rate, t) / 12
+        cash = cash + net
+
+        reserved = np.where(t < loan_repay, float(events["loan_drawn"][t]), 0.0)
+        available = np.maximum(cash - reserved, 0.0)
+        cra_int = np.maximum(0.0, cra_bal * _at(cra_rate, t) / 12)
+
+        # Interest is covered from available cash; when CRA interest is not
+        # affordable the scalar rule nets the HELOC interest against zero cash
+        available = np.where(available >= cra_int, available - cra_int, -heloc_int)
+        short = available < 0
+        heloc_int = np.where(short, heloc_int + available, heloc_int)
+        available = np.where(short, 0.0, available)
+
+        applied = np.where((available > 0) & (cra_bal > 0), np.minimum(available, cra_bal), 0.0)
+        cra_bal = cra_bal - applied
+        available = available - applied
+        applied = np.where((available > 0) & (heloc_bal > 0), np.minimum(available, heloc_bal), 0.0)
+        heloc_bal = heloc_bal - applied
+        available = available - applied
+
+        cash = reserved + available
+
+        cra_paid[(cra_paid < 0) & (cra_bal <= 0)] = t
+        heloc_paid[(heloc_paid < 0) & (heloc_bal <= 0)] = t
+
+        out["Cash"][t] = cash
+        out["CRA Balance"][t] = cra_bal
+        out["HELOC Balance"][t] = heloc_bal
+        out["CRA Interest"][t] = cra_int
+        out["HELOC Interest"][t] = heloc_int
+        out["Monthly Surplus"][t] = net - cra_int - heloc_int
+        out["Monthly Income"][t] = inflow
+        out["Monthly Expenses"][t] = monthly_expenses
+
+    out = {name: out[name].T for name in RESULT_COLUMNS}
+    out["Month"] = np.array(months)
+    out["CRA Paid Off"] = cra_paid
+    out["HELOC Paid Off"] = heloc_paid
+    return out
+
+
+def event_labels(
+    jessica_start_month,
+    loan_repay_month="2026-12",
+    cra_paid_off=-1,
+    heloc_paid_off=-1,
+    schedule=None,
+    horizon_end=HORIZON_END,
+):
+    """Per-month annotation strings matching the ``Label`` column of ``run_simulation``.
+
+    ``cra_paid_off`` / ``heloc_paid_off`` are month indices as reported by
+    ``run_simulation_batch`` (-1 if never).
+    """
+    events = compile_schedule(schedule, end=horizon_end)
+    labels = input_labels(events, jessica_start_month, loan_repay_month)
+    if cra_paid_off >= 0:
+        labels.setdefault(cra_paid_off, []).append("CRA Debt Paid Off")
+    if heloc_paid_off >= 0:
+        labels.setdefault(heloc_paid_off, []).append("HELOC Paid Off")
+    out = [""] * len(events["months"])
+    for t, names in labels.items():
+        out[t] = " | ".join(sorted(set(names)))
+    return out
+
+
+def batch_frame(result, i, jessica_start_month, loan_repay_month="2026-12", schedule=None, expense_path=None):
+    """DataFrame for scenario ``i`` of a ``run_simulation_batch`` result.
+
+    Same columns, values and dtypes as ``run_simulation`` for that
+    scenario's inputs.
+    """
+    import pandas as pd
+
+    # Rows of the (scenarios, months) arrays are contiguous, so the frame's
+    # numeric columns are views into ``result`` rather than copies
+    columns = {"Month": result["Month"]}
+    for name in RESULT_COLUMNS[:5]:
+        columns[name] = result[name][i]
+    columns["Label"] = event_labels(
+        jessica_start_month,
+        loan_repay_month,
+        int(result["CRA Paid Off"][i]),
+        int(result["HELOC Paid Off"][i]),
+        schedule,
+        result["Month"][-1],
+    )
+    for name in RESULT_COLUMNS[5:]:
+        columns[name] = result[name][i]
+    if expense_path is None:
+        expense_path = compile_schedule(schedule, end=result["Month"][-1])["expenses"]
+    if _integer_expenses(expense_path):
+        columns["Monthly Expenses"] = columns["Monthly Expenses"].astype("int64")
+    return pd.DataFrame(columns, copy=False)
+
+
+# Per-month tables compared when the schedule itself changes
+_SCHEDULE_TABLES = ["expenses", "cash", "bonus", "loan", "loan_drawn", "refund", "sales", "sale_deduction", "tax_bill"]
+
+
+def _first_schedule_difference(old_events, new_events):
+    n_months = len(new_events["months"])
+    first = n_months
+    for table in _SCHEDULE_TABLES:
+        for t, (a, b) in enumerate(zip(old_events[table], new_events[table])):
+            if a != b:
+                first = min(first, t)
+                break
+    for t in set(old_events["labels"]) | set(new_events["labels"]):
+        if old_events["labels"].get(t) != new_events["labels"].get(t):
+            first = min(first, t)
+    if old_events["bonus_month"] != new_events["bonus_month"]:
+        first = min(first, *(t for t in (old_events["bonus_month"], new_events["bonus_month"]) if t is not None))
+    return first
+
+
+def first_affected_month(old, new):
+    """Earliest month index whose result can differ between two input dicts.
+
+    Returns the horizon length when the inputs are equivalent.
+    """
+    old_events = compile_schedule(old.get("schedule"), end=old.get("horizon_end", HORIZON_END))
+    new_events = compile_schedule(new.get("schedule"), end=new.get("horizon_end", HORIZON_END))
+    n_months = len(new_events["months"])
+    first = n_months
+    for name in set(old) | set(new):
+        before, after = old.get(name), new.get(name)
+        if before == after:
+            continue
+        if name in ("jessica_start_month", "loan_repay_month"):
+            # Rows before the earlier of the two months are identical
+            month = month_index(min(before, after))
+        elif name == "jessica_income_cad":
+            month = month_index(min(old["jessica_start_month"], new["jessica_start_month"]))
+        elif name == "bonus_milestone_total":
+            month = new_events["bonus_month"]
+        elif name == "cottage_sale_price":
+            month = new_events["sale_month"]
+        elif name == "schedule":
+            month = _first_schedule_difference(old_events, new_events)
+        elif name == "expense_path" and before is not None and after is not None:
+            month = next((t for t, (a, b) in enumerate(zip(before, after)) if a != b), n_months)
+        else:
+            month = 0
+        if month is not None:
+            first = min(first, max(month, 0))
+    return first
+
+
+class IncrementalSimulation:
+    """``run_simulation`` that replays only the months an input change affects.
+
+    Keeps the result buffer of the previous run; on the next call it copies
+    the months before the first affected one into a new buffer and resumes
+    the simulation from there. Earlier buffers are left untouched, since
+    the DataFrames returned for them share their memory.
+    """
+
+    def __init__(self):
+        self.inputs = None
+        self.buffer = None
+        self.replayed = 0
+
+    def run(self, **inputs):
+        inputs.setdefault("loan_repay_month", "2026-12")
+        start = 0 if self.inputs is None else first_affected_month(self.inputs, inputs)
+        self.buffer = simulate_months(**inputs, start=start, previous=self.buffer)
+        self.inputs = inputs
+        self.replayed = len(self.buffer) - start
+        return self.buffer.to_pandas()
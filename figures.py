@@ -0,0 +1,297 @@
+# Plotly figures for the dashboard, built from simulation results
+import numpy as np
+import plotly.graph_objects as go
+
+from profiling import span
+
+# Display limits: series longer than MAX_POINTS are thinned to about that
+# many points per trace, and figures drawing more than WEBGL_POINTS points
+# switch their scatter traces to WebGL, which stays responsive where SVG
+# rendering slows down. Pass ``max_points=None`` for full resolution.
+MAX_POINTS = 1000
+WEBGL_POINTS = 2000
+
+
+def thin_rows(columns, max_points=MAX_POINTS):
+    """Row indices keeping the shape of every series in ``columns`` in
+    about ``max_points`` rows (all rows when there are few enough).
+
+    Rows are split into equal buckets; each bucket keeps its first row and
+    the rows holding each series' minimum and maximum, so peaks and dips
+    survive and every trace built from the kept rows lines up.
+    """
+    n = len(columns[0])
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    n_buckets = max(max_points // (1 + 2 * len(columns)), 1)
+    bucket = np.arange(n) * n_buckets // n
+    starts = np.searchsorted(bucket, np.arange(n_buckets))
+    ends = np.append(starts[1:], n) - 1
+    keep = [starts, [n - 1]]
+    for values in columns:
+        # Sorted by bucket, then value: each bucket's run starts at its minimum
+        order = np.lexsort((np.asarray(values, dtype=float), bucket))
+        keep += [order[starts], order[ends]]
+    return np.unique(np.concatenate(keep))
+
+
+def _thin_frame(df, columns, max_points):
+    rows = thin_rows([df[column] for column in columns], max_points)
+    return df if len(rows) == len(df) else df.iloc[rows]
+
+
+def _thin_bands(mc, columns, max_points):
+    # Monte Carlo dict with every per-month array cut to the same thinned months
+    series = [row for column in columns for row in np.atleast_2d(mc[column])]
+    rows = thin_rows(series, max_points)
+    if len(rows) == len(mc["Month"]):
+        return mc
+    return {
+        key: value[..., rows] if isinstance(value, np.ndarray) and value.shape[-1:] == (len(mc["Month"]),) else value
+        for key, value in mc.items()
+    }
+
+
+def _scatter_type(n_points):
+    return go.Scattergl if n_points > WEBGL_POINTS else go.Scatter
+
+
+def event_points(df, column):
+    """Months, ``column`` values and labels of the labelled months.
+
+    A result has one row per month with every annotation already joined
+    into its label, so the points are read off a label mask.
+    """
+    with span("event_points"):
+        rows = np.flatnonzero((df["Label"] != "").to_numpy())
+        return tuple(df[name].take(rows).to_numpy() for name in ("Month", column, "Label"))
+
+
+def surplus_split(df):
+    """``Monthly Surplus`` as masked arrays: surplus months (deficits masked)
+    and deficit months (surpluses masked)."""
+    values = df["Monthly Surplus"].to_numpy(dtype=float)
+    deficit = values < 0
+    return np.ma.masked_array(values, mask=deficit), np.ma.masked_array(values, mask=~deficit)
+
+
+def balances_figure(df, mc=None, compared=None, max_points=MAX_POINTS):
+    """Cash and debt balances with event stars, optional Monte Carlo bands
+    and saved-scenario overlays."""
+    balance_columns = ["Cash", "CRA Balance", "HELOC Balance"]
+    event_months, event_cash, event_labels = event_points(df, "Cash")
+    df = _thin_frame(df, balance_columns, max_points)
+    if mc is not None:
+        mc = _thin_bands(mc, balance_columns, max_points)
+    compared = {name: _thin_frame(saved_df, balance_columns, max_points) for name, saved_df in (compared or {}).items()}
+    Scatter = _scatter_type(
+        3 * len(df)
+        + (9 * len(mc["Month"]) if mc is not None else 0)
+        + sum(3 * len(saved_df) for saved_df in compared.values())
+    )
+
+    fig = go.Figure()
+    fig.add_trace(Scatter(
+        x=df["Month"], y=df["Cash"], name="Cash Position",
+        line=dict(color="#4B9CD3")
+    ))
+    fig.add_trace(
+        Scatter(
+            x=df["Month"], y=df["CRA Balance"], name="CRA Balance",
+            line=dict(dash="dash", color="#9B59B6")
+        )
+    )
+    fig.add_trace(
+        Scatter(
+            x=df["Month"], y=df["HELOC Balance"], name="HELOC Balance",
+            line=dict(dash="dot", color="#E74C3C")
+        )
+    )
+
+    # Replace per-event stars with a single grouped trace per month
+    fig.add_trace(
+        Scatter(
+            x=event_months,
+            y=event_cash,
+            mode="markers",
+            marker=dict(symbol="star", size=14, color="#F4D03F"),
+            name="Key Events",
+            hovertemplate="<b>%{text}</b><br>Month: %{x}<extra></extra>",
+            text=event_labels
+        )
+    )
+
+    # Monte Carlo P5-P95 bands with a dotted median for each balance
+    if mc is not None:
+        for column, fill in (
+            ("Cash", "rgba(75,156,211,0.15)"),
+            ("CRA Balance", "rgba(155,89,182,0.15)"),
+            ("HELOC Balance", "rgba(231,76,60,0.15)"),
+        ):
+            p5, p50, p95 = mc[column]
+            fig.add_trace(Scatter(
+                x=mc["Month"], y=p95, line=dict(width=0), showlegend=False, hoverinfo="skip",
+                legendgroup=column,
+            ))
+            fig.add_trace(Scatter(
+                x=mc["Month"], y=p5, fill="tonexty", fillcolor=fill, line=dict(width=0),
+                name=f"{column} P5–P95", legendgroup=column,
+            ))
+            fig.add_trace(Scatter(
+                x=mc["Month"], y=p50, name=f"{column} P50", legendgroup=column,
+                line=dict(width=1, dash="dot", color=fill.replace("0.15", "0.8")),
+            ))
+
+    # Saved scenarios overlaid as thin lines, one legend group each
+    for k, (name, saved_df) in enumerate(compared.items()):
+        for column, color in (("Cash", "#4B9CD3"), ("CRA Balance", "#9B59B6"), ("HELOC Balance", "#E74C3C")):
+            fig.add_trace(Scatter(
+                x=saved_df["Month"], y=saved_df[column], name=f"{name}: {column}",
+                legendgroup=name, opacity=0.5,
+                line=dict(width=1, color=color, dash=["longdash", "dashdot", "longdashdot"][k % 3]),
+            ))
+
+    fig.update_layout(
+        title="Cash and Debt Balances Over Time",
+        xaxis_title="Month",
+        yaxis_title="CAD",
+        height=600,
+        template="simple_white",
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        font=dict(color="#333", size=13, family="DM Sans")
+    )
+    return fig
+
+
+def probability_figure(mc, max_points=MAX_POINTS):
+    """Monte Carlo payoff probabilities by month."""
+    columns = ["P(CRA Paid Off)", "P(HELOC Paid Off)", "P(Debt Free)"]
+    paths = mc["Paths"]
+    mc = _thin_bands(mc, columns, max_points)
+    Scatter = _scatter_type(3 * len(mc["Month"]))
+    fig_prob = go.Figure()
+    for column, color in zip(columns, ("#9B59B6", "#E74C3C", "#2ECC71")):
+        fig_prob.add_trace(Scatter(
+            x=mc["Month"], y=mc[column], name=column, line=dict(color=color)
+        ))
+    fig_prob.update_layout(
+        title=f"Probability Debt Is Paid Off by Month ({paths:,} paths)",
+        xaxis_title="Month",
+        yaxis_title="Probability",
+        yaxis_tickformat=".0%",
+        yaxis_range=[0, 1.02],
+        height=400,
+        template="simple_white",
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        font=dict(color="#333", size=13, family="DM Sans")
+    )
+    return fig_prob
+
+
+def interest_figure(df, max_points=MAX_POINTS, barmode="stack"):
+    """Monthly CRA and HELOC interest bars, stacked or grouped."""
+    df = _thin_frame(df, ["CRA Interest", "HELOC Interest"], max_points)
+    fig2 = go.Figure()
+    fig2.add_trace(go.Bar(
+        x=df["Month"], y=df["CRA Interest"], name="CRA Interest", marker_color="#5DADE2"
+    ))
+    fig2.add_trace(go.Bar(
+        x=df["Month"], y=df["HELOC Interest"], name="HELOC Interest", marker_color="#F5B041"
+    ))
+    fig2.update_layout(
+        barmode=barmode,
+        title="Monthly Interest Payments",
+        xaxis_title="Month",
+        yaxis_title="CAD",
+        height=400,
+        template="simple_white",
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        font=dict(color="#333", size=13, family="DM Sans")
+    )
+    return fig2
+
+
+def cashflow_figure(df, max_points=MAX_POINTS, show_events=True):
+    """Monthly income, expenses and surplus/deficit with optional event stars."""
+    events = event_points(df, "Monthly Surplus") if show_events else None
+    df = _thin_frame(df, ["Monthly Income", "Monthly Expenses", "Monthly Surplus"], max_points)
+    Scatter = _scatter_type(4 * len(df))
+    fig_combined = go.Figure()
+
+    fig_combined.add_trace(
+        Scatter(
+            x=df["Month"],
+            y=df["Monthly Income"],
+            name="Monthly Income",
+            line=dict(color="#2ECC71"),
+            mode="lines+markers",
+            marker=dict(size=6),
+        )
+    )
+    fig_combined.add_trace(
+        Scatter(
+            x=df["Month"],
+            y=df["Monthly Expenses"],
+            name="Monthly Expenses",
+            line=dict(color="#F39C12"),
+            mode="lines+markers",
+            marker=dict(size=6),
+        )
+    )
+
+    # Masked months become gaps in each line
+    surplus, deficit = surplus_split(df)
+    # Surplus positive values in soft seafoam
+    fig_combined.add_trace(
+        Scatter(
+            x=df["Month"],
+            y=surplus.filled(np.nan),
+            name="Surplus",
+            line=dict(color="#1ABC9C"),
+            mode="lines+markers",
+            marker=dict(size=6),
+        )
+    )
+    # Surplus negative values in rose red (deficit)
+    fig_combined.add_trace(
+        Scatter(
+            x=df["Month"],
+            y=deficit.filled(np.nan),
+            name="Deficit",
+            line=dict(color="#E74C3C"),
+            mode="lines+markers",
+            marker=dict(size=6),
+        )
+    )
+
+    # Add grouped star markers for key events per month on surplus line for context
+    if events is not None:
+        event_months, event_surplus, event_labels = events
+        fig_combined.add_trace(
+            Scatter(
+                x=event_months,
+                y=np.ma.masked_invalid(event_surplus.astype(float)).filled(0),
+                mode="markers",
+                marker=dict(symbol="star", size=14, color="#F4D03F"),
+                name="Key Events",
+                hovertemplate="<b>%{text}</b><br>Month: %{x}<extra></extra>",
+                text=event_labels,
+                showlegend=True,
+            )
+        )
+
+    fig_combined.update_layout(
+        title="Monthly Income, Expenses, and Surplus",
+        xaxis_title="Month",
+        yaxis_title="CAD",
+        height=500,
+        hovermode="x unified",
+        template="simple_white",
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        font=dict(color="#333", size=13, family="DM Sans")
+    )
+    return fig_combined
@@ -0,0 +1,237 @@
+# Monte Carlo mode: stochastic FX, rates and income run through the batch engine
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+
+from engine import CRA_RATE, HELOC_RATE, HORIZON_END, HORIZON_START, month_range, run_simulation_batch
+
+# Scenario-months simulated per chunk by default: 10,000 paths over the
+# 32-month dashboard horizon, fewer paths per chunk on longer horizons
+CHUNK_CELLS = 320_000
+
+# Series reduced to percentile bands
+BAND_COLUMNS = ["Cash", "CRA Balance", "HELOC Balance"]
+
+# Default stochastic processes. FX follows a mean-reverting (Ornstein-Uhlenbeck)
+# process in log space around the slider value, the two interest rates follow
+# additive OU processes around their base rates, and both incomes get an i.i.d.
+# lognormal monthly shock. Volatilities and reversion speeds are annualised.
+DEFAULT_PROCESSES = {
+    "fx": {"volatility": 0.06, "reversion": 1.0},
+    "cra_rate": {"volatility": 0.01, "reversion": 0.5, "floor": 0.0},
+    "heloc_rate": {"volatility": 0.01, "reversion": 0.5, "floor": 0.0},
+    "income": {"volatility": 0.05},
+}
+
+
+def merge_processes(overrides=None):
+    """Return ``DEFAULT_PROCESSES`` with any per-process overrides applied."""
+    processes = {name: dict(spec) for name, spec in DEFAULT_PROCESSES.items()}
+    for name, spec in (overrides or {}).items():
+        if name not in processes:
+            raise KeyError(f"unknown process {name!r}")
+        processes[name].update(spec)
+    return processes
+
+
+def _ou_paths(rng, n_paths, n_months, volatility, reversion):
+    # Zero-mean OU deviations sampled exactly on a monthly grid, pinned at 0
+    # in the first month so the known starting value is honoured. Built
+    # month-major and returned as an (n_paths, n_months) view so the engine
+    # reads each month contiguously.
+    dt = 1 / 12
+    paths = np.zeros((n_months, n_paths))
+    if volatility == 0 or n_months < 2:
+        return paths.T
+    if reversion > 0:
+        decay = np.exp(-reversion * dt)
+        step_sd = volatility * np.sqrt((1 - decay**2) / (2 * reversion))
+    else:
+        decay = 1.0
+        step_sd = volatility * np.sqrt(dt)
+    shocks = rng.standard_normal((n_months - 1, n_paths))
+    shocks *= step_sd
+    for t in range(1, n_months):
+        np.multiply(paths[t - 1], decay, out=paths[t])
+        paths[t] += shocks[t - 1]
+    return paths.T
+
+
+def sample_paths(rng, n_paths, base_inputs, processes, n_months):
+    """Draw ``n_paths`` stochastic input sets for ``run_simulation_batch``.
+
+    ``base_inputs`` holds the scalar ``run_simulation`` keyword arguments; the
+    FX rate, interest rates and incomes are replaced by ``(n_paths, n_months)``
+    paths centred on their base values.
+    """
+    inputs = dict(base_inputs)
+
+    fx = processes["fx"]
+    log_fx = _ou_paths(rng, n_paths, n_months, fx["volatility"], fx["reversion"])
+    inputs["fx_rate"] = base_inputs["fx_rate"] * np.exp(log_fx)
+
+    for name, base_rate in (("cra_rate", CRA_RATE), ("heloc_rate", HELOC_RATE)):
+        spec = processes[name]
+        base_rate = base_inputs.get(name, base_rate)
+        deviation = _ou_paths(rng, n_paths, n_months, spec["volatility"], spec["reversion"])
+        inputs[name] = np.maximum(base_rate + deviation, spec["floor"])
+
+    sigma = processes["income"]["volatility"] / np.sqrt(12)
+    for name in ("jack_income_usd", "jessica_income_cad"):
+        shock = rng.standard_normal((n_months, n_paths))
+        shock *= sigma
+        shock -= sigma**2 / 2
+        np.exp(shock, out=shock)
+        shock *= base_inputs[name]
+        inputs[name] = shock.T
+
+    return inputs
+
+
+def _simulate_chunk(base_inputs, processes, seed, n_paths, n_months):
+    rng = np.random.default_rng(seed)
+    inputs = sample_paths(rng, n_paths, base_inputs, processes, n_months)
+    return run_simulation_batch(**inputs)
+
+
+def _histogram(values, lo, width, n_bins):
+    # values: (n, months); lo/width: (months,). Returns (months, n_bins) counts.
+    n_months = values.shape[1]
+    bins = np.floor((values - lo) / width).astype(np.int64)
+    np.clip(bins, 0, n_bins - 1, out=bins)
+    bins += np.arange(n_months) * n_bins
+    return np.bincount(bins.ravel(), minlength=n_months * n_bins).reshape(n_months, n_bins)
+
+
+def _paid_off_counts(result, n_months):
+    # Paths whose CRA, HELOC and total debt first hit zero in each month
+    cra = result["CRA Paid Off"]
+    heloc = result["HELOC Paid Off"]
+    debt = np.where((cra >= 0) & (heloc >= 0), np.maximum(cra, heloc), -1)
+    return np.stack(
+        [np.bincount(idx[idx >= 0], minlength=n_months) for idx in (cra, heloc, debt)]
+    )
+
+
+def _run_chunk(base_inputs, processes, seed, n_paths, n_months, grid):
+    result = _simulate_chunk(base_inputs, processes, seed, n_paths, n_months)
+    return _chunk_summary(result, grid, n_months)
+
+
+def _chunk_summary(result, grid, n_months):
+    lo, width, n_bins = grid
+    hist = np.stack(
+        [_histogram(result[name], lo[i], width[i], n_bins) for i, name in enumerate(BAND_COLUMNS)]
+    )
+    return hist, _paid_off_counts(result, n_months)
+
+
+def _bin_grid(result, n_bins):
+    # Per-(column, month) bin grid from the pilot chunk, padded so later
+    # chunks rarely land outside it
+    lo = np.empty((len(BAND_COLUMNS), result["Cash"].shape[1]))
+    width = np.empty_like(lo)
+    for i, name in enumerate(BAND_COLUMNS):
+        values = result[name]
+        vmin = values.min(axis=0)
+        vmax = values.max(axis=0)
+        pad = np.maximum((vmax - vmin) * 0.25, 1.0)
+        lo[i] = vmin - pad
+        width[i] = (vmax - vmin + 2 * pad) / n_bins
+    return lo, width, n_bins
+
+
+def _histogram_percentiles(hist, lo, width, percentiles):
+    # hist: (months, n_bins). Linear interpolation inside the crossing bin.
+    n_bins = hist.shape[1]
+    cdf = np.cumsum(hist, axis=1)
+    total = cdf[:, -1:]
+    out = np.empty((len(percentiles), hist.shape[0]))
+    rows = np.arange(hist.shape[0])
+    for k, p in enumerate(percentiles):
+        target = total[:, 0] * p / 100
+        idx = np.minimum((cdf < target[:, None]).sum(axis=1), n_bins - 1)
+        below = np.where(idx > 0, cdf[rows, np.maximum(idx - 1, 0)], 0)
+        in_bin = np.maximum(hist[rows, idx], 1)
+        frac = np.clip((target - below) / in_bin, 0, 1)
+        out[k] = lo + (idx + frac) * width
+    return out
+
+
+def run_monte_carlo(
+    base_inputs,
+    n_paths=10000,
+    processes=None,
+    seed=0,
+    chunk_size=None,
+    workers=1,
+    n_bins=2048,
+    percentiles=(5, 50, 95),
+    should_stop=None,
+):
+    """Run ``n_paths`` stochastic scenarios and reduce them to percentile bands.
+
+    Paths are simulated in chunks of ``chunk_size`` (by default as many as
+    fit in ``CHUNK_CELLS`` scenario-months) so memory stays bounded by the
+    chunk, not the path count or the horizon length. Each chunk is reduced straight away to
+    per-month histograms of ``BAND_COLUMNS`` and paid-off counts; percentiles
+    are read off the merged histograms. Every chunk has its own RNG stream
+    spawned from ``seed``, so results are reproducible and independent of
+    ``workers``. With ``workers > 1`` chunks are sharded over a process pool.
+    ``should_stop``, a no-argument callable checked between chunks, aborts
+    the run with ``concurrent.futures.CancelledError`` once it returns True.
+
+    Returns a dict with ``"Month"``, ``"Percentiles"``, one
+    ``(len(percentiles), months)`` array per band column, and the cumulative
+    probabilities ``"P(CRA Paid Off)"``, ``"P(HELOC Paid Off)"`` and
+    ``"P(Debt Free)"`` by month.
+    """
+    processes = merge_processes(processes)
+    months = month_range(HORIZON_START, base_inputs.get("horizon_end", HORIZON_END))
+    n_months = len(months)
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_CELLS // n_months)
+    sizes = [chunk_size] * (n_paths // chunk_size)
+    if n_paths % chunk_size:
+        sizes.append(n_paths % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    # The first chunk runs in-process and fixes the histogram grid
+    pilot = _simulate_chunk(base_inputs, processes, seeds[0], sizes[0], n_months)
+    grid = _bin_grid(pilot, n_bins)
+    hist, paid = _chunk_summary(pilot, grid, n_months)
+    del pilot
+
+    rest = list(zip(seeds[1:], sizes[1:]))
+    if workers > 1 and rest:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = [
+                pool.submit(_run_chunk, base_inputs, processes, s, size, n_months, grid)
+                for s, size in rest
+            ]
+            for future in futures:
+                if should_stop is not None and should_stop():
+                    pool.shutdown(cancel_futures=True)
+                    raise CancelledError("Monte Carlo run cancelled")
+                chunk_hist, chunk_paid = future.result()
+                hist += chunk_hist
+                paid += chunk_paid
+    else:
+        for s, size in rest:
+            if should_stop is not None and should_stop():
+                raise CancelledError("Monte Carlo run cancelled")
+            chunk_hist, chunk_paid = _run_chunk(base_inputs, processes, s, size, n_months, grid)
+            hist += chunk_hist
+            paid += chunk_paid
+
+    lo, width, _ = grid
+    result = {"Month": np.array(months), "Percentiles": tuple(percentiles), "Paths": n_paths}
+    for i, name in enumerate(BAND_COLUMNS):
+        result[name] = _histogram_percentiles(hist[i], lo[i], width[i], percentiles)
+    probabilities = np.cumsum(paid, axis=1) / n_paths
+    result["P(CRA Paid Off)"] = probabilities[0]
+    result["P(HELOC Paid Off)"] = probabilities[1]
+    result["P(Debt Free)"] = probabilities[2]
+    return result
@@ -0,0 +1,323 @@
+# Debt-allocation optimizer: surplus routing, cash reserve and loan timing
+from concurrent.futures import CancelledError
+
+import numpy as np
+
+from engine import (
+    CRA_RATE,
+    CRA_START,
+    HELOC_RATE,
+    HELOC_START,
+    HORIZON_END,
+    RENTAL_INCOME,
+    compile_schedule,
+    month_index,
+)
+
+# Numbers far above any reachable interest and shortfall total stand in for
+# infeasible states so they survive interpolation without producing NaNs
+_INFEASIBLE = 1e20
+
+# Cost per dollar of cash below ``min_cash`` per month. When no policy can
+# hold the floor, the search minimises the shortfall first and interest second.
+_SHORTFALL_COST = 1e8
+
+
+def monthly_flows(inputs):
+    """Exogenous cash flows for a set of ``run_simulation`` inputs.
+
+    Returns ``(months, net, lump, loan_amount, loan_month)``: the recurring
+    net flow per month (incomes, rent, expenses, cash events), the one-off
+    lump sums per month (bonus, refund, sale proceeds, loan draw, tax bill)
+    and the total interest-free loan with the month it is drawn (None when
+    the schedule has no loan).
+    """
+    events = compile_schedule(inputs.get("schedule"), end=inputs.get("horizon_end", HORIZON_END))
+    months = events["months"]
+    n_months = len(months)
+    t = np.arange(n_months)
+    jess = np.where(t >= month_index(inputs["jessica_start_month"]), inputs["jessica_income_cad"], 0.0)
+    net = (
+        inputs["jack_income_usd"] * inputs["fx_rate"]
+        + jess
+        + RENTAL_INCOME
+        - np.asarray(events["expenses"] if inputs.get("expense_path") is None else inputs["expense_path"], dtype=float)
+        + np.asarray(events["cash"], dtype=float)
+    )
+    lump = (
+        np.asarray(events["bonus"], dtype=float)
+        + np.asarray(events["refund"], dtype=float)
+        + np.asarray(events["sales"], dtype=float) * inputs["cottage_sale_price"]
+        - np.asarray(events["sale_deduction"], dtype=float)
+        + np.asarray(events["loan"], dtype=float)
+        - np.asarray(events["tax_bill"], dtype=float)
+    )
+    if events["bonus_month"] is not None:
+        lump[events["bonus_month"]] += inputs["bonus_milestone_total"]
+    loans = np.flatnonzero(events["loan"])
+    loan_amount = float(np.sum(events["loan"]))
+    loan_month = int(loans[0]) if loans.size else None
+    return months, net, lump, loan_amount, loan_month
+
+
+def _split(debt, cra_rate, heloc_rate):
+    # Balances implied by a total debt when payments always go to the
+    # higher-rate debt first, starting from the opening balances
+    if cra_rate >= heloc_rate:
+        cra = np.maximum(debt - HELOC_START, 0.0)
+        return cra, debt - cra
+    heloc = np.maximum(debt - CRA_START, 0.0)
+    return debt - heloc, heloc
+
+
+def _interest(debt, cra_rate, heloc_rate):
+    cra, heloc = _split(debt, cra_rate, heloc_rate)
+    return cra * cra_rate / 12 + heloc * heloc_rate / 12
+
+
+def _simulate_policy(inputs, choose, cra_rate, heloc_rate):
+    # Run one allocation policy forward on exact (not gridded) balances.
+    # ``choose(t, carried, debt, repaid)`` returns (reserve, repay_loan) for
+    # the month, given the cash carried in from last month.
+    months, net, lump, loan_amount, _ = monthly_flows(inputs)
+    cash = float(inputs["start_savings"])
+    debt = float(CRA_START + HELOC_START)
+    repaid = loan_amount == 0
+    rows = {
+        name: np.zeros(len(months))
+        for name in ("Cash", "CRA Balance", "HELOC Balance", "Pay CRA", "Pay HELOC", "Interest", "Loan Repayment")
+    }
+    min_cash = np.inf
+    for t in range(len(months)):
+        interest = float(_interest(debt, cra_rate, heloc_rate))
+        reserve, repay = choose(t, cash, debt, repaid)
+        cash += net[t] + lump[t] - interest
+        if repay and not repaid:
+            cash -= loan_amount
+            rows["Loan Repayment"][t] = loan_amount
+            repaid = True
+        pay = min(max(cash - reserve, 0.0), debt)
+        cra_before, heloc_before = _split(debt, cra_rate, heloc_rate)
+        debt -= pay
+        cash -= pay
+        cra, heloc = _split(debt, cra_rate, heloc_rate)
+        rows["Pay CRA"][t] = cra_before - cra
+        rows["Pay HELOC"][t] = heloc_before - heloc
+        rows["Cash"][t] = cash
+        rows["CRA Balance"][t] = cra
+        rows["HELOC Balance"][t] = heloc
+        rows["Interest"][t] = interest
+        min_cash = min(min_cash, cash)
+    paid = np.flatnonzero(rows["CRA Balance"] + rows["HELOC Balance"] <= 0.005)
+    return {
+        "Month": np.array(months),
+        **rows,
+        "total_interest": float(rows["Interest"].sum()),
+        "debt_free_month": months[paid[0]] if paid.size else None,
+        "min_cash": float(min_cash),
+        "loan_repaid": repaid,
+    }
+
+
+def current_rule(inputs, cra_rate=CRA_RATE, heloc_rate=HELOC_RATE):
+    """The dashboard's rule in the optimizer's cash-flow model.
+
+    All cash goes to debt except the loan amount, held from the draw until
+    ``loan_repay_month`` and paid back that month.
+    """
+    _, _, _, loan_amount, loan_month = monthly_flows(inputs)
+    repay_month = month_index(inputs.get("loan_repay_month", "2026-12"))
+
+    def choose(t, carried, debt, repaid):
+        holding = loan_month is not None and loan_month <= t < repay_month
+        return (loan_amount if holding else 0.0), t == repay_month
+
+    return _simulate_policy(inputs, choose, cra_rate, heloc_rate)
+
+
+def _bracket(axis, x):
+    # Lower grid index and interpolation weight of every ``x`` on ``axis``,
+    # clamped to its ends
+    i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+    w = np.clip((x - axis[i]) / (axis[i + 1] - axis[i]), 0.0, 1.0)
+    return i, w
+
+
+def _lookup(value, cash_axis, debt_axis, cash, debt):
+    # Bilinear interpolation of ``value[cash, debt]`` at arbitrary points
+    i, u = _bracket(cash_axis, cash)
+    k, w = _bracket(debt_axis, debt)
+    return (
+        (value[i, k] * (1 - w) + value[i, k + 1] * w) * (1 - u)
+        + (value[i + 1, k] * (1 - w) + value[i + 1, k + 1] * w) * u
+    )
+
+
+def optimize_allocation(
+    inputs,
+    objective="interest",
+    min_cash=0.0,
+    latest_repay_month=None,
+    cra_rate=CRA_RATE,
+    heloc_rate=HELOC_RATE,
+    reserve_step=5000.0,
+    max_reserve=150000.0,
+    max_shortfall=50000.0,
+    debt_points=201,
+    should_stop=None,
+):
+    """Best surplus-routing policy by dynamic programming over a cash grid.
+
+    Each month the policy picks the cash reserve to hold back (``min_cash``
+    or any multiple of ``reserve_step`` above it up to ``max_reserve``)
+    and, while the interest-free loan is outstanding, whether to repay it
+    now; the rest of the cash goes to debt. ``objective`` is "interest"
+    (total interest over the horizon) or "debt_free" (months carrying debt,
+    ties broken on interest). The loan must be repaid by
+    ``latest_repay_month`` (the horizon end by default). Cash below
+    ``min_cash`` is penalised per dollar and month, so when no policy holds
+    the floor the search minimises the shortfall first and interest second.
+
+    The CRA/HELOC split is not a search dimension: with both debts
+    prepayable and no redraws, a dollar sent to the lower-rate balance while
+    the higher-rate one is outstanding is always beaten by swapping it, so
+    the optimal split is rate-ordered and total debt is a sufficient state.
+    The backward pass runs over states (loan repaid?, cash carried, total
+    debt); cash carried is the smaller of the cash on hand and the chosen
+    reserve, tracked down to ``max_shortfall`` below the lowest reserve.
+    Both axes are grids with bilinear interpolation, which keeps the pass at
+    O(months x states x choices) instead of exponential in the horizon. The
+    policy is then replayed on exact balances; should the replay lose to the
+    dashboard's rule while that rule meets the floor and the deadline, the
+    rule is returned as the optimum.
+
+    ``should_stop``, a no-argument callable checked every month of the
+    backward pass, aborts the search with
+    ``concurrent.futures.CancelledError`` once it returns True.
+
+    Returns ``{"optimal", "current", "interest_saved", "loan_repay_month",
+    "feasible"}`` where ``optimal`` and ``current`` are per-month schedules
+    with totals (see ``current_rule``).
+    """
+    months, net, lump, loan_amount, loan_month = monthly_flows(inputs)
+    n_months = len(months)
+    has_loan = loan_month is not None and loan_amount > 0
+    deadline = n_months - 1 if latest_repay_month is None else min(month_index(latest_repay_month), n_months - 1)
+
+    reserves = np.arange(0.0, max_reserve + reserve_step / 2, reserve_step)
+    reserves = np.union1d(reserves[reserves > min_cash], [min_cash])
+    below = reserves[0] - np.arange(reserve_step, max_shortfall + reserve_step / 2, reserve_step)
+    cash_axis = np.union1d(below, reserves)
+    reserve_at = np.searchsorted(cash_axis, reserves)
+    debts = np.linspace(0.0, float(CRA_START + HELOC_START), debt_points)
+    step = debts[1] - debts[0]
+    n_cash, n_debt = len(cash_axis), len(debts)
+    interest = _interest(debts, cra_rate, heloc_rate)
+
+    def options(t, r):
+        # (repay now?, loan state next month) pairs open to loan state r
+        if not has_loan or r == 1:
+            return [(False, 1)]
+        due = [] if t >= deadline else [(False, 0)]
+        return due + [(True, 1)] if loan_month <= t <= deadline else due
+
+    def month_cost(new_cash, new_debt):
+        cost = np.maximum(min_cash - new_cash, 0.0) * _SHORTFALL_COST
+        if objective == "debt_free":
+            cost = cost + (new_debt > 0.005) * 1e6
+        return cost
+
+    # future[t][r, i, k]: best cost from month t + 1 on with loan state r (1
+    # once repaid), cash carried i and debt k. Terminal: an unpaid loan is
+    # infeasible. Kept for every month so the replay can look one month ahead.
+    value = np.zeros((2, n_cash, n_debt))
+    if has_loan:
+        value[0] = _INFEASIBLE
+    future = np.empty((n_months, 2, n_cash, n_debt), dtype=np.float32)
+    # Cash on hand before any decision, per (cash carried, debt) state
+    on_hand = cash_axis[:, None] - interest[None, :]
+    debt_grid = np.broadcast_to(debts, on_hand.shape)
+    # Debt left, in grid steps, after paying down to reserve j, less the
+    # month's flows: the same for every month, so computed once
+    shift = (debts[None, :, None] + reserves - on_hand[..., None]) / step  # (cash, debt, reserve)
+    debt_steps = np.arange(n_debt)[None, :, None]
+    rows = reserve_at * n_debt
+    for t in range(n_months - 1, -1, -1):
+        if should_stop is not None and should_stop():
+            raise CancelledError("optimization cancelled")
+        future[t] = value
+        best = np.full((2, n_cash, n_debt), np.inf)
+        for r in (0, 1):
+            for repay, next_r in options(t, r):
+                v = value[next_r]
+                after = on_hand + net[t] + lump[t] - repay * loan_amount
+                # Every reserve lands on a grid line of one axis, so each
+                # case needs only a one-dimensional interpolation. Hold all
+                # the cash: the debt stays on its grid point.
+                i, u = _bracket(cash_axis, after)
+                k = np.arange(n_debt)
+                cost = v[i, k] * (1 - u) + v[i + 1, k] * u + month_cost(after, debt_grid)
+                # Clear the debt and carry the rest
+                left = after - debts
+                i, u = _bracket(cash_axis, left)
+                clear = v[i, 0] * (1 - u) + v[i + 1, 0] * u + month_cost(left, 0.0)
+                cost = np.minimum(cost, np.where(left >= reserves[0], clear, np.inf))
+                # Pay down part of the debt, carrying exactly reserve j
+                pos = shift - (net[t] + lump[t] - repay * loan_amount) / step
+                lo = np.clip(pos, 0, n_debt - 2).astype(np.int64)
+                flat = v.ravel()
+                low = np.take(flat, rows + lo)
+                partial = low + (np.take(flat, rows + lo + 1) - low) * (pos - lo)
+                partial = np.where((pos > 0) & (pos < debt_steps), partial, np.inf).min(axis=-1)
+                # Reserves hold the floor and some debt remains
+                partial = partial + month_cost(reserves[0], 1.0)
+                best[r] = np.minimum(best[r], np.minimum(cost, partial))
+        value = np.minimum(np.where(np.isfinite(best), best, _INFEASIBLE) + interest[None, None, :], _INFEASIBLE)
+
+    # The replay picks each month's reserve by the same one-month lookahead
+    # on exact cash and debt; "hold everything" is an infinite reserve
+    candidates = np.append(reserves, np.inf)
+
+    def choose(t, carried, debt, repaid):
+        r = 1 if (repaid or not has_loan) else 0
+        on_hand = carried + net[t] + lump[t] - float(_interest(debt, cra_rate, heloc_rate))
+        picks = []
+        for repay, next_r in options(t, r):
+            after = on_hand - repay * loan_amount
+            pay = np.clip(after - candidates, 0.0, debt)
+            new_cash, new_debt = after - pay, debt - pay
+            cost = _lookup(future[t, next_r], cash_axis, debts, new_cash, new_debt)
+            cost = cost + month_cost(new_cash, new_debt)
+            j = int(np.argmin(cost))
+            picks.append((cost[j], candidates[j], repay))
+        if not picks:
+            return np.inf, False
+        _, reserve, repay = min(picks, key=lambda pick: pick[0])
+        return reserve, repay
+
+    optimal = _simulate_policy(inputs, choose, cra_rate, heloc_rate)
+    current = current_rule(inputs, cra_rate, heloc_rate)
+    if _meets(current, min_cash, deadline) and _rank(current, objective) < _rank(optimal, objective):
+        optimal = current
+    repaid_at = np.flatnonzero(optimal["Loan Repayment"])
+    return {
+        "optimal": optimal,
+        "current": current,
+        "interest_saved": current["total_interest"] - optimal["total_interest"],
+        "loan_repay_month": months[repaid_at[0]] if repaid_at.size else None,
+        "feasible": _meets(optimal, min_cash, deadline),
+    }
+
+
+def _meets(schedule, min_cash, deadline):
+    # Loan repaid by the deadline with cash never below the floor
+    repaid_at = np.flatnonzero(schedule["Loan Repayment"])
+    on_time = schedule["loan_repaid"] and (repaid_at.size == 0 or repaid_at[0] <= deadline)
+    return bool(on_time and schedule["min_cash"] >= min_cash - 0.005)
+
+
+def _rank(schedule, objective):
+    # Sort key of a schedule under ``objective``; lower is better
+    if objective == "debt_free":
+        return int(np.count_nonzero(schedule["CRA Balance"] + schedule["HELOC Balance"] > 0.005)), schedule["total_interest"]
+    return schedule["total_interest"]
@@ -0,0 +1,230 @@
+# Opt-in profiling: named timing spans per script rerun with allocation deltas
+from collections import deque
+import contextlib
+import contextvars
+import json
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+# Profiler collecting spans in the current context (None when profiling is
+# off, which makes every ``span`` call a lookup and a shared no-op)
+_active = contextvars.ContextVar("profiler", default=None)
+_NULL_SPAN = contextlib.nullcontext()
+
+# tracemalloc is process-wide; count the profilers that asked for it
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+# Its peak is process-wide too, and every span resets it, so only one rerun
+# at a time may record peaks: (profiler, script thread) of that rerun
+_peak_owner = None
+
+
+def span(name):
+    """Context manager timing ``name`` in the active profiler, if any."""
+    profiler = _active.get()
+    if profiler is None:
+        return _NULL_SPAN
+    return profiler.span(name)
+
+
+def stage(name):
+    """Close the active profiler's current top-level stage and open ``name``."""
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.stage(name)
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _claim_peak(profiler):
+    # True if ``profiler`` may reset and record the peak for this rerun; a
+    # claim whose rerun died without finishing is taken over
+    global _peak_owner
+    with _tracing_lock:
+        if _peak_owner is None or not _peak_owner[1].is_alive():
+            _peak_owner = (profiler, threading.current_thread())
+        return _peak_owner[0] is profiler
+
+
+def _release_peak(profiler):
+    global _peak_owner
+    with _tracing_lock:
+        if _peak_owner is not None and _peak_owner[0] is profiler:
+            _peak_owner = None
+
+
+class Profiler:
+    """Spans for one session's reruns, with rolling stats over the last ``history``.
+
+    A rerun runs from ``start_rerun`` to ``finish_rerun``; within it
+    ``stage(name)`` splits the script into consecutive top-level stages and
+    ``span(name)`` nests timings inside them. Each span records its wall
+    time, the net change in traced memory and the traced peak above its
+    starting point (tracemalloc runs only while a profiler is enabled).
+    Traced memory is process-wide, so allocation figures include other
+    threads' work. The peak is reset by every span, so a rerun that overlaps
+    another session's profiled rerun records no peak (``peak_bytes`` None).
+    """
+
+    def __init__(self, history=50):
+        self.enabled = False
+        self.reruns = deque(maxlen=history)
+        self._rerun = None
+        self._stack = []
+        self._stage = None
+        self._origin = time.perf_counter_ns()
+        self._count = 0
+        self._peaks = False
+
+    def set_enabled(self, enabled):
+        if enabled and not self.enabled:
+            _start_tracing()
+        elif self.enabled and not enabled:
+            _stop_tracing()
+        self.enabled = enabled
+
+    def start_rerun(self):
+        if self._rerun is not None:
+            self.finish_rerun()
+        if not self.enabled:
+            return
+        self._count += 1
+        self._rerun = []
+        self._peaks = _claim_peak(self)
+        _active.set(self)
+
+    def finish_rerun(self):
+        if self._rerun is None:
+            return
+        while self._stack:
+            self._close()
+        self._stage = None
+        self.reruns.append(self._rerun)
+        self._rerun = None
+        if self._peaks:
+            _release_peak(self)
+            self._peaks = False
+        _active.set(None)
+
+    def _open(self, name):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._peaks:
+            if self._stack:
+                # Fold the running peak into the parent before resetting it
+                self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], peak)
+            tracemalloc.reset_peak()
+        record = {
+            "rerun": self._count,
+            "name": name,
+            "depth": len(self._stack),
+            "_start": time.perf_counter_ns(),
+            "_memory": current,
+            "_peak": 0,
+        }
+        self._stack.append(record)
+        return record
+
+    def _close(self):
+        end = time.perf_counter_ns()
+        current, peak = tracemalloc.get_traced_memory()
+        record = self._stack.pop()
+        peak = max(record.pop("_peak"), peak)
+        if self._stack:
+            self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], peak)
+        start = record.pop("_start")
+        memory = record.pop("_memory")
+        record.update(
+            start_us=(start - self._origin) / 1e3,
+            wall_ms=(end - start) / 1e6,
+            alloc_bytes=current - memory,
+            peak_bytes=max(peak - memory, 0) if self._peaks else None,
+        )
+        self._rerun.append(record)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        if self._rerun is None:
+            yield
+            return
+        record = self._open(name)
+        try:
+            yield
+        finally:
+            while self._stack and self._stack[-1] is not record:
+                self._close()
+            if self._stack:
+                self._close()
+
+    def stage(self, name):
+        if self._rerun is None:
+            return
+        if self._stage is not None:
+            while self._stack and self._stack[-1] is not self._stage:
+                self._close()
+            if self._stack:
+                self._close()
+        self._stage = self._open(name)
+
+    def summary(self):
+        """Per span name: last and rolling p50/p95 wall time, last allocation
+        delta and peak, and the number of samples, in first-seen order."""
+        samples = {}
+        last = {}
+        for rerun in self.reruns:
+            for record in sorted(rerun, key=lambda r: r["start_us"]):
+                samples.setdefault(record["name"], []).append(record["wall_ms"])
+        if self.reruns:
+            for record in self.reruns[-1]:
+                last[record["name"]] = record
+        rows = []
+        for name, walls in samples.items():
+            p50, p95 = np.percentile(walls, [50, 95])
+            record = last.get(name)
+            rows.append({
+                "Span": "  " * (record["depth"] if record else 0) + name,
+                "Last ms": record["wall_ms"] if record else None,
+                "p50 ms": p50,
+                "p95 ms": p95,
+                "Alloc KB": record["alloc_bytes"] / 1024 if record else None,
+                "Peak KB": record["peak_bytes"] / 1024 if record and record["peak_bytes"] is not None else None,
+                "Samples": len(walls),
+            })
+        return rows
+
+    def to_jsonl(self):
+        """One JSON object per recorded span."""
+        return "".join(json.dumps(record) + "\n" for rerun in self.reruns for record in rerun)
+
+    def to_chrome_trace(self):
+        """The recorded spans in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        events = [
+            {
+                "name": record["name"],
+                "ph": "X",
+                "ts": record["start_us"],
+                "dur": record["wall_ms"] * 1e3,
+                "pid": 1,
+                "tid": record["rerun"],
+                "args": {"alloc_bytes": record["alloc_bytes"], "peak_bytes": record["peak_bytes"]},
+            }
+            for rerun in self.reruns
+            for record in rerun
+        ]
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
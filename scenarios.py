@@ -0,0 +1,173 @@
+# Named scenario store: saved input sets and their results on local disk
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cache import _json_default, content_key
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".scenarios")
+
+# Inputs copied into their own index columns so listing can filter on them
+_INDEXED_INPUTS = ["fx_rate", "jessica_start_month", "bonus_milestone_total", "cottage_sale_price"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    inputs TEXT NOT NULL,
+    fx_rate REAL,
+    jessica_start_month TEXT,
+    bonus_milestone_total REAL,
+    cottage_sale_price REAL,
+    final_cash REAL,
+    total_interest REAL,
+    debt_free_month TEXT
+);
+CREATE INDEX IF NOT EXISTS scenarios_name ON scenarios (name);
+CREATE INDEX IF NOT EXISTS scenarios_saved_at ON scenarios (saved_at);
+CREATE INDEX IF NOT EXISTS scenarios_inputs ON scenarios (jessica_start_month, bonus_milestone_total, cottage_sale_price);
+"""
+
+
+def scenario_summary(df):
+    """Headline numbers for one ``run_simulation`` result."""
+    debt = df["CRA Balance"] + df["HELOC Balance"]
+    paid = df["Month"][debt <= 0]
+    return {
+        "final_cash": float(df["Cash"].iloc[-1]),
+        "min_cash": float(df["Cash"].min()),
+        "total_interest": float(df["CRA Interest"].sum() + df["HELOC Interest"].sum()),
+        "debt_free_month": paid.iloc[0] if len(paid) else None,
+    }
+
+
+class ScenarioStore:
+    """Named scenarios saved as one Arrow IPC file each plus a SQLite index.
+
+    Scenarios are keyed by the content hash of their inputs, so saving the
+    same inputs again only renames the entry. Result columns are written
+    uncompressed and read back through a memory map, so loading a scenario
+    maps its numeric columns straight into the DataFrame without copying or
+    re-simulating. The index holds the name, save time, inputs and summary
+    numbers, so listing and filtering never touch the result files.
+    """
+
+    def __init__(self, directory=SCENARIO_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, "index.sqlite")
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the store safe to share
+        # across the server's script threads. sqlite3's own context manager
+        # only commits, so the connection is closed here as well
+        db = sqlite3.connect(self._index_path)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key[:20]}.arrow")
+
+    def save(self, name, inputs, df):
+        """Save ``df`` (the result of ``inputs``) under ``name``; returns its key."""
+        key = content_key("scenario", inputs)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp = self._path(key) + ".tmp"
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, self._path(key))
+        summary = scenario_summary(df)
+        row = {
+            "key": key,
+            "name": name,
+            "saved_at": time.time(),
+            "inputs": json.dumps(inputs, sort_keys=True, default=_json_default),
+            **{column: inputs.get(column) for column in _INDEXED_INPUTS},
+            "final_cash": summary["final_cash"],
+            "total_interest": summary["total_interest"],
+            "debt_free_month": summary["debt_free_month"],
+        }
+        with self._connect() as db:
+            db.execute(
+                f"INSERT OR REPLACE INTO scenarios ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                list(row.values()),
+            )
+        return key
+
+    def list(self, name_contains=None, limit=500, **filters):
+        """Saved scenarios, newest first, as a DataFrame of index rows.
+
+        ``filters`` match the indexed inputs exactly (e.g.
+        ``jessica_start_month="2025-09"``).
+        """
+        clauses, params = [], []
+        if name_contains:
+            clauses.append("name LIKE ?")
+            params.append(f"%{name_contains}%")
+        for column, value in filters.items():
+            if column not in _INDEXED_INPUTS:
+                raise KeyError(f"{column!r} is not an indexed input")
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT * FROM scenarios {where} ORDER BY saved_at DESC LIMIT ?", [*params, limit]
+            ).fetchall()
+        return pd.DataFrame([dict(row) for row in rows], columns=[
+            "key", "name", "saved_at", "inputs", *_INDEXED_INPUTS, "final_cash", "total_interest", "debt_free_month",
+        ])
+
+    def inputs(self, key):
+        with self._connect() as db:
+            row = db.execute("SELECT inputs FROM scenarios WHERE key = ?", [key]).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row["inputs"])
+
+    def load(self, key):
+        """The saved result DataFrame, with numeric columns backed by the file's memory map."""
+        source = pa.memory_map(self._path(key), "r")
+        table = pa.ipc.open_file(source).read_all()
+        columns = {}
+        for name in table.column_names:
+            column = table.column(name)
+            if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+                column = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+                columns[name] = column.to_numpy(zero_copy_only=True)
+            else:
+                columns[name] = column.to_pandas()
+        return pd.DataFrame(columns, copy=False)
+
+    def delete(self, key):
+        with self._connect() as db:
+            db.execute("DELETE FROM scenarios WHERE key = ?", [key])
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+
+def compare_scenarios(frames):
+    """Diff table for ``{name: result DataFrame}``, relative to the first entry."""
+    table = pd.DataFrame({name: scenario_summary(df) for name, df in frames.items()}).T
+    months = next(iter(frames.values()))["Month"].tolist()
+    table["debt_free_index"] = [months.index(m) if m in months else np.nan for m in table["debt_free_month"]]
+    for column in ("final_cash", "min_cash", "total_interest", "debt_free_index"):
+        values = table[column].astype(float)
+        table[f"{column} vs first"] = values - values.iloc[0]
+    return table.drop(columns="debt_free_index").rename(
+        columns={"debt_free_index vs first": "debt_free_months vs first"}
+    )
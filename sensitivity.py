@@ -0,0 +1,138 @@
+# Sensitivity analysis: tornado swings and pairwise interactions in one batch
+import numpy as np
+
+from engine import CRA_RATE, EXPENSES, HELOC_RATE, RENTAL_INCOME, run_simulation_batch
+
+# Inputs perturbed by the tornado with their default base values: the
+# numeric sidebar inputs plus constants of the model. The scheduled cash
+# events (the FTC benefit by default) and the cottage deduction are schedule
+# amounts, so they move as multipliers.
+SENSITIVITY_INPUTS = {
+    "jack_income_usd": None,
+    "fx_rate": None,
+    "jessica_income_cad": None,
+    "bonus_milestone_total": None,
+    "start_savings": None,
+    "cottage_sale_price": None,
+    "base_expenses": EXPENSES,
+    "rental_income": RENTAL_INCOME,
+    "cra_rate": CRA_RATE,
+    "heloc_rate": HELOC_RATE,
+    "sale_deduction_scale": 1.0,
+    "cash_event_scale": 1.0,
+}
+
+# A percentage of zero is zero, so inputs whose base is 0 (no milestone bonus
+# in the Base Case) move by a percentage of these amounts instead, never
+# dropping below zero
+ZERO_BASE_AMOUNTS = {
+    "bonus_milestone_total": 150000,
+}
+
+SENSITIVITY_LABELS = {
+    "jack_income_usd": "Jack's Income",
+    "fx_rate": "USD to CAD Rate",
+    "jessica_income_cad": "Jessica's Income",
+    "bonus_milestone_total": "Milestone Bonus",
+    "start_savings": "Starting Savings",
+    "cottage_sale_price": "Cottage Sale Price",
+    "base_expenses": "Monthly Expenses",
+    "rental_income": "Rental Income",
+    "cra_rate": "CRA Rate",
+    "heloc_rate": "HELOC Rate",
+    "sale_deduction_scale": "Cottage Deduction",
+    "cash_event_scale": "Scheduled Cash Events",
+}
+
+METRIC_LABELS = {
+    "final_cash": "Final Cash (CAD)",
+    "total_interest": "Total Interest (CAD)",
+    "debt_free_month": "Debt-Free Month (index)",
+}
+
+
+def scenario_metrics(result):
+    """Final cash, total interest and debt-free month per batch scenario.
+
+    Scenarios that never clear both debts get the month after the horizon
+    as their debt-free month, so swings stay finite.
+    """
+    n_months = result["Cash"].shape[1]
+    cra = result["CRA Paid Off"]
+    heloc = result["HELOC Paid Off"]
+    return {
+        "final_cash": result["Cash"][:, -1],
+        "total_interest": result["CRA Interest"].sum(axis=1) + result["HELOC Interest"].sum(axis=1),
+        "debt_free_month": np.where((cra >= 0) & (heloc >= 0), np.maximum(cra, heloc), n_months).astype(float),
+    }
+
+
+def _run_factors(base_inputs, factors):
+    # One batch call where every perturbed input gets its own per-scenario
+    # multiplier array; everything else is shared by the whole batch
+    inputs = dict(base_inputs)
+    for name, factor in factors.items():
+        if name == "base_expenses" and inputs.get("expense_path") is not None:
+            # An imported expense path replaces the constant; scale it instead
+            path = np.asarray(inputs["expense_path"], dtype=float)
+            inputs["expense_path"] = path * np.asarray(factor, dtype=float)[:, None]
+            continue
+        base = inputs.get(name, SENSITIVITY_INPUTS[name])
+        factor = np.asarray(factor, dtype=float)
+        if np.ndim(base) == 0 and base == 0 and name in ZERO_BASE_AMOUNTS:
+            inputs[name] = np.maximum((factor - 1) * ZERO_BASE_AMOUNTS[name], 0.0)
+        else:
+            inputs[name] = base * factor
+    return scenario_metrics(run_simulation_batch(**inputs))
+
+
+def tornado(base_inputs, pct=0.1, names=None):
+    """One-at-a-time swings of every input in ``names`` by ``-pct`` / ``+pct``.
+
+    The base case and both perturbations of every input run as ``2N + 1``
+    scenarios of a single ``run_simulation_batch`` call, so the schedule is
+    compiled once and every month is stepped once for the whole set. Inputs
+    that are 0 move by ``pct`` of their ``ZERO_BASE_AMOUNTS`` entry.
+
+    Returns a dict with the input ``names``, the ``base`` metrics and, per
+    metric, ``low`` / ``high`` arrays of the change from base for each input.
+    """
+    names = list(SENSITIVITY_INPUTS if names is None else names)
+    n = len(names)
+    factors = {name: np.ones(2 * n + 1) for name in names}
+    for k, name in enumerate(names):
+        factors[name][1 + 2 * k] = 1 - pct
+        factors[name][2 + 2 * k] = 1 + pct
+    metrics = _run_factors(base_inputs, factors)
+    base = {key: float(values[0]) for key, values in metrics.items()}
+    return {
+        "names": names,
+        "pct": pct,
+        "base": base,
+        "low": {key: values[1::2] - base[key] for key, values in metrics.items()},
+        "high": {key: values[2::2] - base[key] for key, values in metrics.items()},
+    }
+
+
+def interaction_grid(base_inputs, pair, pct=0.1, steps=9):
+    """Joint perturbation of two inputs over a ``steps`` x ``steps`` grid.
+
+    Both inputs move from ``-pct`` to ``+pct`` in one batch call. Besides
+    each metric's change from base, returns its second-order ``interaction``
+    part: the joint change less the two one-at-a-time changes, which are
+    read off the grid's centre row and column (``steps`` is made odd so the
+    grid contains the unperturbed value).
+    """
+    steps += 1 - steps % 2
+    x_name, y_name = pair
+    offsets = np.linspace(-pct, pct, steps)
+    fx, fy = np.meshgrid(1 + offsets, 1 + offsets)
+    metrics = _run_factors(base_inputs, {x_name: fx.ravel(), y_name: fy.ravel()})
+    c = steps // 2
+    change, interaction = {}, {}
+    for key, values in metrics.items():
+        grid = values.reshape(steps, steps)
+        base = grid[c, c]
+        change[key] = grid - base
+        interaction[key] = grid - grid[c:c + 1, :] - grid[:, c:c + 1] + base
+    return {"offsets": offsets, "change": change, "interaction": interaction}
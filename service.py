@@ -0,0 +1,196 @@
+# Shared compute service: heavy jobs on a bounded worker pool for every session
+#
+# Monte Carlo runs, optimizations and sweeps are submitted here instead of
+# running in a session's script thread. Identical requests share one job
+# (and its cached result), at most ``workers`` jobs run at once with a
+# bounded queue behind them, and a job nobody is waiting for any more is
+# cancelled: dropped from the queue, or asked to stop if it is running.
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+import itertools
+import threading
+import time
+
+from cache import content_key
+
+
+class _Job:
+    # One computation, shared by every ticket holding it
+    def __init__(self, key, kind, seq):
+        self.key = key
+        self.kind = kind
+        self.seq = seq
+        self.state = "queued"
+        self.waiters = 0
+        self.submitted = time.monotonic()
+        self.stop = threading.Event()
+        self.future = None
+
+
+class Ticket:
+    """A session's claim on a job's result.
+
+    ``wait`` and ``result`` behave like a future's; ``release`` gives the
+    claim up, cancelling the job once no ticket holds it.
+    """
+
+    def __init__(self, service, job=None, value=None):
+        self._service = service
+        self._job = job
+        self._value = value
+        self._released = job is None
+
+    @property
+    def key(self):
+        return self._job.key if self._job is not None else None
+
+    def wait(self, timeout=None):
+        """True once the result is ready (or the job failed or was cancelled)."""
+        if self._job is None:
+            return True
+        return bool(wait_futures([self._job.future], timeout).done)
+
+    def result(self, timeout=None):
+        if self._job is None:
+            return self._value
+        return self._job.future.result(timeout)
+
+    def status(self):
+        """"queued (n ahead)", "running" or "done"."""
+        if self._job is None or self._job.future.done():
+            return "done"
+        return self._service._describe(self._job)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._service._release(self)
+
+
+class ComputeService:
+    """Process-wide runner for heavy jobs on ``workers`` threads.
+
+    ``submit`` returns a ``Ticket``. Results are cached in ``cache`` (a
+    ``ResultCache``, whose byte budget bounds the memory they hold) by the
+    content hash of the job's kind and inputs, so a finished job is a cache
+    hit for everyone; an unfinished one is joined rather than repeated. At
+    most ``max_queued`` jobs wait for a worker; beyond that ``submit``
+    raises ``RuntimeError``. With an ``owner`` (a session id), a new
+    request of the same kind replaces that owner's previous one.
+    """
+
+    def __init__(self, cache, workers=2, max_queued=32):
+        self.cache = cache
+        self.workers = workers
+        self.max_queued = max_queued
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compute")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._claims = {}
+        self._seq = itertools.count()
+        self.submitted = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, kind, inputs, compute, owner=None):
+        """Claim the result of ``compute(should_stop)`` for ``kind``/``inputs``.
+
+        ``should_stop`` is a no-argument callable that turns True once the
+        job is cancelled; long computations may poll it and give up early.
+        """
+        key = content_key(kind, inputs)
+        value = self.cache.get(key)
+        if value is not None:
+            ticket = Ticket(self, value=value)
+        else:
+            with self._lock:
+                job = self._jobs.get(key)
+                if job is None:
+                    queued = sum(1 for j in self._jobs.values() if j.state == "queued")
+                    if queued >= self.max_queued:
+                        raise RuntimeError(f"compute queue is full ({queued} jobs waiting)")
+                    job = self._jobs[key] = _Job(key, kind, next(self._seq))
+                    job.future = self._pool.submit(self._run, job, compute)
+                    self.submitted += 1
+                else:
+                    self.coalesced += 1
+                job.waiters += 1
+                ticket = Ticket(self, job)
+        if owner is not None:
+            with self._lock:
+                previous = self._claims.get((owner, kind))
+                self._claims[(owner, kind)] = ticket
+            if previous is not None and previous.key != ticket.key:
+                previous.release()
+        return ticket
+
+    def _run(self, job, compute):
+        with self._lock:
+            if job.stop.is_set():
+                raise CancelledError()
+            job.state = "running"
+        try:
+            value = compute(job.stop.is_set)
+        except BaseException:
+            with self._lock:
+                job.state = "failed"
+                self.failed += not job.stop.is_set()
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+            raise
+        self.cache.put(job.key, value)
+        with self._lock:
+            job.state = "done"
+            self.completed += 1
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+        return value
+
+    def _release(self, ticket):
+        job = ticket._job
+        with self._lock:
+            for claim, held in list(self._claims.items()):
+                if held is ticket:
+                    del self._claims[claim]
+            job.waiters -= 1
+            if job.waiters > 0 or job.future.done():
+                return
+            # Nobody wants the result any more: drop it from the queue, or
+            # ask the running computation to stop
+            job.stop.set()
+            job.future.cancel()
+            self.cancelled += 1
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    def _describe(self, job):
+        with self._lock:
+            if job.state != "queued":
+                return job.state
+            ahead = sum(1 for j in self._jobs.values() if j.state == "queued" and j.seq < job.seq)
+        return f"queued ({ahead} ahead)"
+
+    def stats(self):
+        """Queue and worker counters plus the result cache's statistics."""
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+            waiting = sum(job.waiters for job in self._jobs.values())
+            oldest = min((job.submitted for job in self._jobs.values()), default=None)
+        return {
+            "workers": self.workers,
+            "queued": states.count("queued"),
+            "running": states.count("running"),
+            "waiting_sessions": waiting,
+            "oldest_job_s": time.monotonic() - oldest if oldest is not None else 0.0,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cache": self.cache.stats(),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
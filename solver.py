@@ -0,0 +1,150 @@
+# Goal seek: threshold inputs that make a debt / cash target hold
+import numpy as np
+
+from engine import month_index, run_simulation_batch
+
+# Free variables and the default range searched for each
+VARIABLE_BOUNDS = {
+    "cottage_sale_price": (0.0, 1500000.0),
+    "fx_rate": (0.8, 2.5),
+    "jessica_income_cad": (0.0, 30000.0),
+    "start_savings": (0.0, 1000000.0),
+}
+
+VARIABLE_LABELS = {
+    "cottage_sale_price": "Cottage Sale Price (CAD)",
+    "fx_rate": "USD to CAD Exchange Rate",
+    "jessica_income_cad": "Jessica's Monthly Income (CAD)",
+    "start_savings": "Starting Savings (CAD)",
+}
+
+
+def meets_targets(result, targets):
+    """Boolean per scenario: does a ``run_simulation_batch`` result meet ``targets``?
+
+    ``targets`` may hold ``cra_paid_by`` / ``heloc_paid_by`` ("YYYY-MM": the
+    balance reaches zero by that month) and ``min_cash`` (cash never drops
+    below the amount). All given targets must hold.
+    """
+    ok = np.ones(result["Cash"].shape[0], dtype=bool)
+    for key, column in (("cra_paid_by", "CRA Paid Off"), ("heloc_paid_by", "HELOC Paid Off")):
+        if targets.get(key) is not None:
+            paid = result[column]
+            ok &= (paid >= 0) & (paid <= month_index(targets[key]))
+    if targets.get("min_cash") is not None:
+        ok &= result["Cash"].min(axis=1) >= targets["min_cash"]
+    return ok
+
+
+def _evaluate(base_inputs, targets, values):
+    inputs = dict(base_inputs)
+    inputs.update({name: np.asarray(v, dtype=float) for name, v in values.items()})
+    return meets_targets(run_simulation_batch(**inputs), targets)
+
+
+def _bracket_search(base_inputs, targets, values, name, lo, hi, direction, points, tol, max_rounds):
+    # K-ary bisection on many brackets at once: every round evaluates
+    # ``points`` candidates per bracket in one batch call and keeps the pair
+    # of neighbours where the target flips. ``values`` holds any other
+    # variables, one entry per bracket.
+    lo = np.asarray(lo, dtype=float).copy()
+    hi = np.asarray(hi, dtype=float).copy()
+    evaluations = 0
+    for _ in range(max_rounds):
+        if np.all(hi - lo <= tol):
+            break
+        grid = lo[:, None] + (hi - lo)[:, None] * np.linspace(0, 1, points)
+        batch = {key: np.repeat(v, points) for key, v in values.items()}
+        batch[name] = grid.ravel()
+        ok = _evaluate(base_inputs, targets, batch).reshape(grid.shape)
+        evaluations += grid.size
+        rows = np.arange(grid.shape[0])
+        if direction == "min":
+            # First passing candidate; the failing lower end guarantees j >= 1
+            j = np.clip(np.argmax(ok, axis=1), 1, points - 1)
+            lo, hi = grid[rows, j - 1], grid[rows, j]
+        else:
+            # Last passing candidate; the failing upper end guarantees j <= points - 2
+            j = np.clip(points - 1 - np.argmax(ok[:, ::-1], axis=1), 0, points - 2)
+            lo, hi = grid[rows, j], grid[rows, j + 1]
+    threshold = hi if direction == "min" else lo
+    return threshold, evaluations
+
+
+def solve_threshold(base_inputs, variable, targets, bounds=None, points=64, tol=None, max_rounds=8):
+    """Smallest (or largest) value of one input for which ``targets`` hold.
+
+    The target is assumed monotone in ``variable`` over ``bounds``. Returns
+    a dict with ``status`` ("solved", "always" when it holds across the whole
+    range, or "infeasible"), the threshold ``value``, ``direction`` ("min"
+    when larger values help, "max" otherwise) and the number of scenario
+    ``evaluations``.
+    """
+    lo, hi = bounds or VARIABLE_BOUNDS[variable]
+    tol = (hi - lo) * 1e-6 if tol is None else tol
+    ends = _evaluate(base_inputs, targets, {variable: [lo, hi]})
+    if ends.all():
+        return {"status": "always", "value": None, "direction": None, "evaluations": 2}
+    if not ends.any():
+        return {"status": "infeasible", "value": None, "direction": None, "evaluations": 2}
+    direction = "min" if ends[1] else "max"
+    value, evaluations = _bracket_search(
+        base_inputs, targets, {}, variable, [lo], [hi], direction, points, tol, max_rounds
+    )
+    return {"status": "solved", "value": float(value[0]), "direction": direction, "evaluations": evaluations + 2}
+
+
+def feasibility_frontier(
+    base_inputs, variables, targets, bounds=None, grid=60, points=32, tol=None, max_rounds=6
+):
+    """Feasible region and threshold frontier for two free inputs.
+
+    Evaluates a ``grid`` x ``grid`` lattice over the two variables in one
+    batch call for the feasibility map, then, for each value of the first
+    variable, finds the threshold of the second with a batched bisection
+    over all columns at once.
+
+    Returns a dict with the axis values ``x`` and ``y``, the ``(len(y),
+    len(x))`` boolean ``feasible`` map, the ``frontier`` threshold of the
+    second variable per ``x`` (NaN where none exists in range) and its
+    ``direction`` per ``x``.
+    """
+    x_name, y_name = variables
+    bounds = bounds or {}
+    x_lo, x_hi = bounds.get(x_name, VARIABLE_BOUNDS[x_name])
+    y_lo, y_hi = bounds.get(y_name, VARIABLE_BOUNDS[y_name])
+    tol = (y_hi - y_lo) * 1e-6 if tol is None else tol
+    x = np.linspace(x_lo, x_hi, grid)
+    y = np.linspace(y_lo, y_hi, grid)
+    xx, yy = np.meshgrid(x, y)
+    feasible = _evaluate(base_inputs, targets, {x_name: xx.ravel(), y_name: yy.ravel()}).reshape(xx.shape)
+    evaluations = xx.size
+
+    frontier = np.full(grid, np.nan)
+    direction = np.full(grid, None, dtype=object)
+    ok_lo, ok_hi = feasible[0], feasible[-1]
+    for side, mask in (("min", ~ok_lo & ok_hi), ("max", ok_lo & ~ok_hi)):
+        if mask.any():
+            threshold, used = _bracket_search(
+                base_inputs,
+                targets,
+                {x_name: x[mask]},
+                y_name,
+                np.full(mask.sum(), y_lo),
+                np.full(mask.sum(), y_hi),
+                side,
+                points,
+                tol,
+                max_rounds,
+            )
+            frontier[mask] = threshold
+            direction[mask] = side
+            evaluations += used
+    return {
+        "x": x,
+        "y": y,
+        "feasible": feasible,
+        "frontier": frontier,
+        "direction": direction,
+        "evaluations": evaluations,
+    }
@@ -0,0 +1,328 @@
+# Transaction import: Monarch and bank CSV exports as monthly expense totals
+#
+# Exports are read line by line and never held as rows, so a multi-year file
+# costs memory only for the running totals. Each transaction is categorised
+# by the first matching rule and summed, in whole cents, into per-month,
+# per-category spending. Totals are cached on disk by the file's content
+# hash; a file that extends a cached one, with new rows appended at the end
+# or inserted under the header (Monarch exports run newest first), only has
+# its new rows parsed.
+import csv
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+
+from engine import month_index, month_range
+
+TRANSACTION_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "transactions")
+
+# Header names (lower-cased) recognised for each field, in priority order.
+# Monarch exports have Date, Merchant, Category, Account, Original Statement,
+# Notes, Amount and Tags; bank exports often split the amount into debit
+# and credit columns. Single amounts are negative for spending.
+COLUMN_ALIASES = {
+    "date": ("date", "transaction date", "posted date", "posting date"),
+    "description": ("merchant", "description", "payee", "name", "original statement", "memo"),
+    "category": ("category",),
+    "amount": ("amount",),
+    "debit": ("debit", "withdrawal", "withdrawals"),
+    "credit": ("credit", "deposit", "deposits"),
+}
+
+# Category for transactions that are not spending (transfers, card
+# payments, income); they are left out of the totals
+EXCLUDED = None
+
+# Rule table: the first rule whose ``pattern`` (a case-insensitive regular
+# expression) matches the transaction's ``field`` ("category", the export's
+# own category, or "description") decides its category. Unmatched
+# transactions keep the export's category, or "Other" when it has none.
+DEFAULT_RULES = [
+    {"field": "category", "pattern": r"transfer|credit card payment|balance adjustment", "category": EXCLUDED},
+    {"field": "category", "pattern": r"paycheck|income|interest|dividend|reimbursement", "category": EXCLUDED},
+    {"field": "description", "pattern": r"payroll|direct deposit|payment - thank you|transfer (to|from)", "category": EXCLUDED},
+    {"field": "category", "pattern": r"mortgage|rent", "category": "Mortgage & Rent"},
+    {"field": "description", "pattern": r"mortgage", "category": "Mortgage & Rent"},
+    {"field": "category", "pattern": r"child ?care|daycare", "category": "Childcare"},
+    {"field": "description", "pattern": r"day ?care", "category": "Childcare"},
+    {"field": "category", "pattern": r"education|tuition|school", "category": "Education"},
+    {"field": "description", "pattern": r"tuition", "category": "Education"},
+    {"field": "category", "pattern": r"groceries", "category": "Groceries"},
+    {"field": "category", "pattern": r"restaurant|coffee|bars|dining", "category": "Dining"},
+    {"field": "category", "pattern": r"gas & electric|electric|water|utilit|internet|phone", "category": "Utilities"},
+    {"field": "category", "pattern": r"^gas$|auto|fuel|parking|transit|taxi|ride ?share", "category": "Transportation"},
+    {"field": "category", "pattern": r"insurance", "category": "Insurance"},
+    {"field": "category", "pattern": r"medical|dentist|pharmacy|health|fitness", "category": "Health"},
+    {"field": "category", "pattern": r"travel|vacation", "category": "Travel"},
+]
+
+# Distinct (description, category) pairs remembered by a categoriser
+_MEMO_LIMIT = 100_000
+_DATE_PARTS = re.compile(r"[/.\-]")
+
+
+def categoriser(rules=None):
+    """``categorise(description, category)`` for a rule table (``DEFAULT_RULES``
+    by default), memoised per distinct pair since merchants repeat."""
+    compiled = [
+        (rule["field"], re.compile(rule["pattern"], re.IGNORECASE), rule["category"])
+        for rule in (DEFAULT_RULES if rules is None else rules)
+    ]
+    memo = {}
+
+    def categorise(description, category):
+        key = (description, category)
+        if key not in memo:
+            if len(memo) >= _MEMO_LIMIT:
+                memo.clear()
+            fields = {"description": description, "category": category}
+            memo[key] = next(
+                (target for field, pattern, target in compiled if pattern.search(fields[field])),
+                category or "Other",
+            )
+        return memo[key]
+
+    return categorise
+
+
+def resolve_columns(header):
+    """Index of each ``COLUMN_ALIASES`` field in ``header`` (None when absent)."""
+    names = [name.strip().lower() for name in header]
+    columns = {
+        field: next((names.index(alias) for alias in aliases if alias in names), None)
+        for field, aliases in COLUMN_ALIASES.items()
+    }
+    if columns["date"] is None or all(columns[field] is None for field in ("amount", "debit", "credit")):
+        raise ValueError("CSV needs a date column and an amount (or debit/credit) column")
+    return columns
+
+
+def _month(value, day_first=False):
+    # "YYYY-MM" of an ISO (Monarch), M/D/Y or, with ``day_first``, D/M/Y date
+    value = value.split()[0]
+    parts = _DATE_PARTS.split(value)
+    if len(parts[0]) == 4:
+        year, month = parts[0], parts[1]
+    else:
+        month, year = parts[1] if day_first else parts[0], parts[2]
+        if len(year) == 2:
+            year = "20" + year
+    month = int(month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"bad date {value!r}")
+    return f"{int(year):04d}-{month:02d}"
+
+
+def _cents(value):
+    # Signed whole cents of "-1,234.56", "$12.00" or accounting "(12.00)"
+    value = value.strip().replace("$", "").replace(",", "")
+    if not value:
+        return 0
+    if value.startswith("(") and value.endswith(")"):
+        return -round(float(value[1:-1]) * 100)
+    return round(float(value) * 100)
+
+
+def accumulate(lines, columns, categorise, totals, day_first=False):
+    """Add the CSV rows in ``lines`` (no header) to ``totals``.
+
+    ``totals`` maps "YYYY-MM" to ``{category: spending in cents}``; rows in
+    excluded categories are skipped. Returns ``(rows, errors)``, counting
+    rows whose date or amount could not be read as errors.
+    """
+    date, amount, debit, credit = columns["date"], columns["amount"], columns["debit"], columns["credit"]
+    description, category = columns["description"], columns["category"]
+    rows = errors = 0
+    for record in csv.reader(lines):
+        if not record:
+            continue
+        rows += 1
+        try:
+            month = _month(record[date], day_first)
+            if amount is not None:
+                spent = -_cents(record[amount])
+            else:
+                spent = (_cents(record[debit]) if debit is not None else 0) - (
+                    _cents(record[credit]) if credit is not None else 0
+                )
+        except (ValueError, IndexError):
+            errors += 1
+            continue
+        target = categorise(
+            record[description] if description is not None and description < len(record) else "",
+            record[category] if category is not None and category < len(record) else "",
+        )
+        if target is EXCLUDED:
+            continue
+        by_category = totals.setdefault(month, {})
+        by_category[target] = by_category.get(target, 0) + spent
+    return rows, errors
+
+
+def _lines(f, start, end):
+    # Decoded lines of the byte range [start, end), which starts on a line
+    f.seek(start)
+    position = start
+    while position < end:
+        line = f.readline()
+        if not line:
+            return
+        position += len(line)
+        yield line.decode("utf-8", errors="replace")
+
+
+def _hash_range(f, start, end, block=1 << 20):
+    digest = hashlib.sha256()
+    f.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = f.read(min(block, remaining))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def _ends_line(f, position):
+    if position == 0:
+        return True
+    f.seek(position - 1)
+    return f.read(1) == b"\n"
+
+
+def _extension(f, size, header_size, entries):
+    # The largest cached entry that ``f`` extends, with the byte range of
+    # the new rows, or None
+    for entry in sorted(entries, key=lambda e: -e["size"]):
+        if entry["size"] >= size or entry["header_size"] != header_size:
+            continue
+        if _ends_line(f, entry["size"]) and _hash_range(f, 0, entry["size"]) == entry["sha"]:
+            return entry, (entry["size"], size)
+        body_start = size - (entry["size"] - header_size)
+        if (
+            _ends_line(f, body_start)
+            and _hash_range(f, 0, header_size) == entry["header_sha"]
+            and _hash_range(f, body_start, size) == entry["body_sha"]
+        ):
+            return entry, (header_size, body_start)
+    return None
+
+
+def import_transactions(source, rules=None, day_first=False, cache_dir=TRANSACTION_CACHE_DIR):
+    """Monthly per-category spending from a CSV export (a path or the file's bytes).
+
+    Results are cached in ``cache_dir`` by content hash and settings, so the
+    same file is only hashed the next time; a file extending a cached one
+    has only its new rows parsed and added to the cached totals.
+
+    Returns a dict with ``"totals"`` (``{"YYYY-MM": {category: dollars}}``,
+    months in order), the ``"rows"`` and ``"errors"`` counts, the rows
+    ``"parsed"`` by this call and the ``"source"`` of the result: "cache",
+    "extended" or "parsed".
+    """
+    settings = hashlib.sha256(
+        json.dumps({"rules": DEFAULT_RULES if rules is None else rules, "day_first": day_first}).encode()
+    ).hexdigest()[:16]
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else io.BytesIO(source)
+    with f:
+        header_line = f.readline()
+        header_size = len(header_line)
+        size = f.seek(0, os.SEEK_END)
+        sha = _hash_range(f, 0, size)
+        path = os.path.join(cache_dir, f"{sha[:20]}-{settings}.json")
+        if os.path.exists(path):
+            with open(path) as cached:
+                entry = json.load(cached)
+            return _result(entry, "cache", 0)
+
+        header = next(csv.reader([header_line.decode("utf-8-sig", errors="replace")]), [])
+        columns = resolve_columns(header)
+        entries = []
+        for name in glob.glob(os.path.join(cache_dir, f"*-{settings}.json")):
+            with open(name) as cached:
+                entries.append(json.load(cached))
+        extension = _extension(f, size, header_size, entries)
+        if extension is not None:
+            base, (start, end) = extension
+            totals = {month: dict(by_category) for month, by_category in base["totals"].items()}
+            rows, errors = base["rows"], base["errors"]
+        else:
+            start, end = header_size, size
+            totals, rows, errors = {}, 0, 0
+        parsed, new_errors = accumulate(_lines(f, start, end), columns, categoriser(rules), totals, day_first)
+        entry = {
+            "sha": sha,
+            "size": size,
+            "header_size": header_size,
+            "header_sha": _hash_range(f, 0, header_size),
+            "body_sha": _hash_range(f, header_size, size),
+            "totals": totals,
+            "rows": rows + parsed,
+            "errors": errors + new_errors,
+        }
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as out:
+        json.dump(entry, out)
+    os.replace(tmp, path)
+    return _result(entry, "extended" if extension is not None else "parsed", parsed)
+
+
+def _result(entry, source, parsed):
+    return {
+        "totals": {
+            month: {category: cents / 100 for category, cents in sorted(entry["totals"][month].items())}
+            for month in sorted(entry["totals"])
+        },
+        "rows": entry["rows"],
+        "errors": entry["errors"],
+        "parsed": parsed,
+        "source": source,
+    }
+
+
+def expense_vector(totals, months, categories=None, window=12, expense_changes=None):
+    """Total monthly expenses for each of ``months`` from imported ``totals``.
+
+    Months from the first to the last imported month use their actual
+    spending in ``categories`` (all by default). Months after the import
+    use the mean of its last ``window`` months, and months before it the
+    mean of its first ``window``. ``expense_changes``, the schedule's
+    cumulative expense changes per month (``compile_schedule``), moves those
+    projections by the change since the nearest imported month, so
+    scheduled changes the actuals already include are not counted twice.
+    """
+    imported = sorted(totals)
+    if not imported:
+        raise ValueError("no imported months")
+
+    def spending(month):
+        by_category = totals.get(month, {})
+        return sum(amount for category, amount in by_category.items() if categories is None or category in categories)
+
+    span = month_range(imported[0], imported[-1])
+    actual = [spending(month) for month in span]
+    early = sum(actual[:window]) / len(actual[:window])
+    late = sum(actual[-window:]) / len(actual[-window:])
+    actual = dict(zip(span, actual))
+
+    def change(month):
+        # Cumulative scheduled change in effect in ``month`` (clamped to the horizon)
+        if expense_changes is None:
+            return 0
+        t = month_index(month, months[0])
+        return expense_changes[min(max(t, 0), len(months) - 1)] if t >= 0 else 0
+
+    vector = []
+    for month in months:
+        if month in actual:
+            vector.append(actual[month])
+        elif month > imported[-1]:
+            vector.append(late + change(month) - change(imported[-1]))
+        else:
+            vector.append(early + change(month) - change(imported[0]))
+    return vector